@@ -0,0 +1,115 @@
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# --- ANÁLISE DE CONSUMO ---
+# Taxas de consumo por item calculadas a partir dos eventos 'consumo' do diário de movimentos.
+# O consumo é guardado já somado por dia (ID -> {dia: qtd}); cada baixa só marca o item como
+# "sujo", e na próxima consulta apenas os itens sujos são recalculados (groupby sobre eles).
+# Na virada do dia as janelas andam para todos, então aí o recálculo é completo, uma vez por dia.
+#
+# A taxa diária mistura as janelas de 7, 30 e 90 dias (pesos em PESOS_JANELAS), dando mais peso
+# ao uso recente sem ignorar a sazonalidade. Itens com histórico mais curto que a janela dividem
+# pelo tempo desde o primeiro uso (no mínimo 7 dias), para não subestimar itens novos.
+#
+# Na carga só entram os eventos OPERACOES dos últimos max(JANELAS) dias (o armazenamento filtra,
+# sem decodificar o resto do histórico). De antes disso basta saber quais itens já tinham uso
+# (`anteriores`, ID -> ts de um uso antigo): o divisor deles já está no teto da maior janela.
+#
+# A sugestão de compra cobre o prazo de entrega mais COBERTURA_DIAS, acima do estoque mínimo.
+# Quando um fornecedor já tem algum item no ponto de pedido, os itens dele que chegariam ao
+# ponto de pedido dentro da cobertura entram no mesmo pedido, evitando vários pedidos pequenos.
+JANELAS = (7, 30, 90)
+PESOS_JANELAS = (0.5, 0.3, 0.2)
+PRAZO_ENTREGA_DIAS = 7
+COBERTURA_DIAS = 30
+OPERACOES = ('consumo', 'exclusao')
+
+def _dia(ts):
+    return date.fromisoformat(str(ts)[:10]).toordinal()
+
+def inicio_das_janelas(hoje=None):
+    return ((hoje or date.today()) - timedelta(days=max(JANELAS))).isoformat()
+
+class AnaliseConsumo:
+    def __init__(self, eventos=(), anteriores=None):
+        self.lock = threading.Lock(); self.versao = 0
+        self.consumo_diario = {}; self.primeiro_uso = {int(i): _dia(ts) for i, ts in (anteriores or {}).items()}; self.sujos = set(); self.dia_calculado = None
+        self.taxas = pd.DataFrame(columns=self.colunas_taxas()); self._previsao = (None, None)
+        self.registrar(eventos)
+
+    @staticmethod
+    def colunas_taxas():
+        return [f"Consumo {j}d" for j in JANELAS] + ["Consumo Diário", "Último Uso"]
+
+    def registrar(self, eventos):
+        # Chamado a cada gravação de movimentos: só acumula, o cálculo fica para a próxima consulta.
+        with self.lock:
+            for evento in eventos:
+                if evento.get('op') == 'exclusao':
+                    # O ID de um item excluído pode ser reaproveitado por um item novo: o histórico não passa adiante.
+                    self.consumo_diario.pop(int(evento['id']), None); self.primeiro_uso.pop(int(evento['id']), None)
+                    self.sujos.add(int(evento['id'])); continue
+                if evento.get('op') != 'consumo' or not evento.get('qtd'): continue
+                item_id = int(evento['id']); dia = _dia(evento['ts'])
+                dias = self.consumo_diario.setdefault(item_id, {}); dias[dia] = dias.get(dia, 0.0) + float(evento['qtd'])
+                self.primeiro_uso[item_id] = min(dia, self.primeiro_uso.get(item_id, dia)); self.sujos.add(item_id)
+
+    def _calcular(self, ids, hoje):
+        registros = [(item_id, dia, qtd) for item_id in ids for dia, qtd in self.consumo_diario.get(item_id, {}).items()]
+        if not registros: return pd.DataFrame(columns=self.colunas_taxas())
+        uso = pd.DataFrame(registros, columns=['ID', 'dia', 'qtd']); idade = hoje - uso['dia']
+        taxas = pd.DataFrame({f"Consumo {j}d": uso['qtd'].where(idade < j, 0.0).groupby(uso['ID']).sum() for j in JANELAS})
+        historico = hoje - np.array([self.primeiro_uso[item_id] for item_id in taxas.index]) + 1
+        taxas["Consumo Diário"] = sum(peso * taxas[f"Consumo {j}d"] / np.clip(historico, 7, j) for j, peso in zip(JANELAS, PESOS_JANELAS))
+        taxas["Último Uso"] = [date.fromordinal(int(d)) for d in uso.groupby('ID')['dia'].max()]
+        return taxas
+
+    def obter_taxas(self, hoje=None):
+        return self._atualizar(hoje)[1]
+
+    def _atualizar(self, hoje=None):
+        hoje = (hoje or date.today()).toordinal()
+        with self.lock:
+            if hoje != self.dia_calculado:
+                # Dias fora da maior janela não contam mais para taxa nenhuma; o primeiro uso fica guardado à parte.
+                for dias in self.consumo_diario.values():
+                    for dia in [d for d in dias if hoje - d >= max(JANELAS)]: del dias[dia]
+                self.taxas = self._calcular(list(self.consumo_diario), hoje); self.dia_calculado = hoje; self.sujos.clear(); self.versao += 1
+            elif self.sujos:
+                ids = list(self.sujos); atualizadas = self._calcular(ids, hoje)
+                self.taxas = pd.concat([self.taxas.drop(ids, errors='ignore'), atualizadas]) if not self.taxas.empty else atualizadas
+                self.sujos.clear(); self.versao += 1
+            return self.versao, self.taxas
+
+    def previsao_com_chave(self, estoque_df, versao_estoque, prazo_entrega=PRAZO_ENTREGA_DIAS, cobertura=COBERTURA_DIAS, hoje=None):
+        # Resultado guardado por (versão do estoque, versão das taxas, parâmetros): reruns sem alteração não recalculam nada.
+        # A chave também identifica o resultado para quem guarda derivados dele (ex.: o PDF da lista de compras).
+        versao_taxas, taxas = self._atualizar(hoje)
+        chave = (versao_estoque, versao_taxas, prazo_entrega, cobertura)
+        if self._previsao[0] == chave: return self._previsao
+        df = estoque_df[['ID', 'Nome do Item', 'Marca/Modelo', 'Fornecedor Principal', 'Quantidade em Estoque', 'Estoque Mínimo', 'Preço de Custo']]
+        df = df.join(taxas[["Consumo Diário", "Último Uso"]], on='ID')
+        taxa = df["Consumo Diário"].astype(float).fillna(0.0).to_numpy(); estoque = df['Quantidade em Estoque'].to_numpy(dtype=float)
+        minimo = df['Estoque Mínimo'].to_numpy(dtype=float)
+        # Sem consumo registrado o item não tem previsão de ruptura (NaN), só o critério do estoque mínimo.
+        with np.errstate(divide='ignore', invalid='ignore'): dias = np.where(taxa > 0, estoque / taxa, np.nan)
+        ponto_pedido = minimo + taxa * prazo_entrega
+        comprar = np.ceil(np.clip(ponto_pedido + taxa * cobertura - estoque, 0, None))
+        urgente = estoque <= ponto_pedido; em_breve = estoque - taxa * cobertura <= ponto_pedido
+        resultado = df.assign(**{"Consumo Diário": taxa, "Dias até Acabar": dias, "Ponto de Pedido": ponto_pedido, "Quantidade a Comprar": comprar, "Urgente": urgente})
+        fornecedores_urgentes = resultado.loc[urgente, 'Fornecedor Principal'].unique()
+        resultado["Comprar Agora"] = urgente | (em_breve & resultado['Fornecedor Principal'].isin(fornecedores_urgentes).to_numpy() & (comprar > 0))
+        resultado["Custo Estimado"] = resultado["Quantidade a Comprar"] * resultado['Preço de Custo'].fillna(0.0)
+        self._previsao = (chave, resultado)
+        return self._previsao
+
+def pedidos_por_fornecedor(previsao):
+    pedido = previsao[previsao["Comprar Agora"]]
+    if pedido.empty: return pd.DataFrame(columns=['Fornecedor Principal', 'Itens', 'Urgentes', 'Quantidade Total', 'Custo Estimado', 'Menor Prazo (dias)'])
+    resumo = pedido.groupby('Fornecedor Principal', observed=True).agg(**{
+        'Itens': ('ID', 'size'), 'Urgentes': ('Urgente', 'sum'), 'Quantidade Total': ('Quantidade a Comprar', 'sum'),
+        'Custo Estimado': ('Custo Estimado', 'sum'), 'Menor Prazo (dias)': ('Dias até Acabar', 'min')})
+    return resumo.reset_index().sort_values(['Menor Prazo (dias)', 'Custo Estimado'], ascending=[True, False])
@@ -1,9 +1,14 @@
 import streamlit as st
 import pandas as pd
-from datetime import date, datetime
-from fpdf import FPDF
-import os
-import json
+from datetime import date
+from estoque_core import (
+    COLUNAS, abrir_estoque, adicionar_item, registrar_uso_em_lote, eventos_do_editor, aplicar_edicoes,
+    definir_colunas_visiveis, alterar_cadastro, prever_compras, gerar_lista_de_compras, gerar_pdf_relatorio
+)
+from analise_consumo import pedidos_por_fornecedor
+from instrumentacao import medidor
+
+medidor.iniciar_rerun()
 
 # --- CONFIGURAÇÃO INICIAL DA PÁGINA ---
 st.set_page_config(
@@ -12,10 +17,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- CONSTANTES DE ARQUIVOS ---
-ESTOQUE_FILE = 'estoque.csv'
-CADASTROS_FILE = 'cadastros.json'
-
 # --- CSS E COMPONENTES VISUAIS ---
 def carregar_componentes_visuais(num_itens_alerta=0):
     st.markdown('<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.1/css/all.min.css">', unsafe_allow_html=True)
@@ -106,116 +107,83 @@ def carregar_componentes_visuais(num_itens_alerta=0):
     </style>
     """, unsafe_allow_html=True)
 
-# --- FUNÇÕES DE PERSISTÊNCIA ---
-def salvar_dados():
-    st.session_state['estoque_df'].to_csv(ESTOQUE_FILE, index=False)
-    cadastros = {
-        'categorias': st.session_state.categorias, 'fornecedores': st.session_state.fornecedores,
-        'colunas_visiveis': st.session_state.get('colunas_visiveis', [])
-    }
-    with open(CADASTROS_FILE, 'w', encoding='utf-8') as f: json.dump(cadastros, f)
-
-def carregar_dados():
-    colunas = ["ID", "Nome do Item", "Marca/Modelo", "Tipo/Especificação", "Categoria", "Fornecedor Principal", "Quantidade em Estoque", "Estoque Mínimo", "Unidade de Medida", "Preço de Custo", "Data da Última Compra", "Observações"]
-    if os.path.exists(ESTOQUE_FILE) and os.path.exists(CADASTROS_FILE):
-        st.session_state.estoque_df = pd.read_csv(ESTOQUE_FILE)
-        with open(CADASTROS_FILE, 'r', encoding='utf-8') as f:
-            cadastros = json.load(f)
-            st.session_state.categorias = cadastros.get('categorias', [])
-            st.session_state.fornecedores = cadastros.get('fornecedores', [])
-            st.session_state.colunas_visiveis = cadastros.get('colunas_visiveis', ['Nome do Item', 'Marca/Modelo', 'Categoria', 'Quantidade em Estoque'])
-    else:
-        st.session_state.update({
-            'categorias': ["Agulhas", "Tintas", "Descartáveis", "Higiene"],
-            'fornecedores': ["Art Prime", "Tattoo Loja", "Fornecedor Local"],
-            'colunas_visiveis': ['Nome do Item', 'Marca/Modelo', 'Categoria', 'Quantidade em Estoque'],
-            'estoque_df': pd.DataFrame(columns=colunas)
-        })
-        def adicionar_item_inicial(nome, marca, especificacao, categoria, fornecedor, quantidade, estoque_minimo, unidade, preco_custo, observacoes="", save=True):
-            df = st.session_state.estoque_df; novo_id = 1 if df.empty else df["ID"].max() + 1
-            novo_item = pd.DataFrame([{"ID": novo_id, "Nome do Item": nome, "Marca/Modelo": marca, "Tipo/Especificação": especificacao, "Categoria": categoria, "Fornecedor Principal": fornecedor, "Quantidade em Estoque": float(quantidade), "Estoque Mínimo": int(estoque_minimo), "Unidade de Medida": unidade, "Preço de Custo": float(preco_custo), "Data da Última Compra": date.today().strftime("%Y-%m-%d"), "Observações": observacoes}])
-            st.session_state.estoque_df = pd.concat([df, novo_item], ignore_index=True)
-            if save: salvar_dados()
-        adicionar_item_inicial("Cartucho", "Cheyenne", "7RL", "Agulhas", "Art Prime", 25, 30, "Unidade", 3.00, save=False)
-        adicionar_item_inicial("Tinta Preta", "Dynamic", "Triple Black", "Tintas", "Tattoo Loja", 240, 100, "ml", 0.37, save=False)
-        adicionar_item_inicial("Luva Nitrílica", "Talge", "M", "Descartáveis", "Fornecedor Local", 40, 50, "Par", 0.80, save=True)
-
-# --- FUNÇÕES DE LÓGICA ---
-def adicionar_item(nome, marca, especificacao, categoria, fornecedor, quantidade, estoque_minimo, unidade, preco_custo, observacoes=""):
-    df = st.session_state.estoque_df; novo_id = 1 if df.empty else df["ID"].max() + 1
-    novo_item = pd.DataFrame([{"ID": novo_id, "Nome do Item": nome, "Marca/Modelo": marca, "Tipo/Especificação": especificacao, "Categoria": categoria, "Fornecedor Principal": fornecedor, "Quantidade em Estoque": float(quantidade), "Estoque Mínimo": int(estoque_minimo), "Unidade de Medida": unidade, "Preço de Custo": float(preco_custo), "Data da Última Compra": date.today().strftime("%Y-%m-%d"), "Observações": observacoes}])
-    st.session_state.estoque_df = pd.concat([df, novo_item], ignore_index=True)
-    salvar_dados()
+# --- ESTADO COMPARTILHADO ---
+# O motor do estoque fica em estoque_core.py; aqui só o tornamos único por processo.
+@st.cache_resource
+def obter_estado():
+    return abrir_estoque()
 
-def registrar_uso(item_id, quantidade_usada):
-    df = st.session_state.estoque_df; idx = df.index[df['ID'] == item_id][0]
-    df.loc[idx, 'Quantidade em Estoque'] -= float(quantidade_usada)
-    st.session_state.estoque_df = df
-    salvar_dados()
+# --- RELATÓRIOS EM PDF ---
+@st.cache_data(max_entries=8, show_spinner=False)
+def _pdf_em_cache(versao, colunas, titulo, _dataframe):
+    # `_dataframe` não entra no hash: a chave é a versão do estoque mais o conjunto de colunas.
+    # Roda fora do rerun (o download_button chama numa thread à parte), então vira um registro avulso.
+    # O "Gerado em" do PDF é o da primeira geração desta versão: downloads seguintes, sem alteração no
+    # estoque, recebem os mesmos bytes, e o horário continua valendo para os dados que o PDF mostra.
+    with medidor.avulso(f"PDF: {titulo}", "pdf"): return gerar_pdf_relatorio(_dataframe[list(colunas)], titulo)
 
-def gerar_lista_de_compras():
-    df = st.session_state.estoque_df
-    lista = df[df['Quantidade em Estoque'] <= df['Estoque Mínimo']].copy()
-    if not lista.empty:
-        lista['Quantidade a Comprar'] = lista['Estoque Mínimo'] - lista['Quantidade em Estoque']
-        return lista[['Nome do Item', 'Marca/Modelo', 'Fornecedor Principal', 'Quantidade em Estoque', 'Estoque Mínimo', 'Quantidade a Comprar']]
-    return None
-
-def gerar_pdf_relatorio(dataframe, titulo):
-    pdf = FPDF(orientation='L', unit='mm', format='A4'); pdf.add_page()
-    pdf.set_font("Arial", "B", 16); pdf.cell(0, 10, titulo, 0, 1, "C"); pdf.ln(5)
-    pdf.set_font("Arial", "", 10); pdf.cell(0, 10, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}", 0, 1, "R"); pdf.ln(5)
-    pdf.set_font("Arial", "B", 8); pdf.set_fill_color(46, 46, 84); pdf.set_text_color(255, 255, 255)
-    col_width = (pdf.w - 2 * pdf.l_margin) / len(dataframe.columns) if len(dataframe.columns) > 0 else 0
-    for header in dataframe.columns: pdf.cell(col_width, 10, str(header), 1, 0, "C", fill=True)
-    pdf.ln()
-    pdf.set_font("Arial", "", 8); pdf.set_text_color(0, 0, 0); fill = False
-    for _, row in dataframe.iterrows():
-        for item in row: pdf.cell(col_width, 10, str(item), 1, 0, "C", fill=fill)
-        fill = not fill; pdf.ln()
-    return bytes(pdf.output(dest='S'))
+def pdf_sob_demanda(versao, dataframe, titulo, colunas=None):
+    # O download_button chama isto só quando o usuário clica, em vez de gerar o PDF a cada render.
+    colunas = tuple(dataframe.columns if colunas is None else colunas)
+    return lambda: _pdf_em_cache(versao, colunas, titulo, dataframe)
 
 # --- PÁGINAS DO APP ---
 def pagina_painel_principal():
     st.markdown("<h3><i class='fa-solid fa-chart-simple'></i> Painel Principal</h3>", unsafe_allow_html=True); st.write("Resumo geral do seu inventário.")
-    df = st.session_state.estoque_df; valor_total = (df['Quantidade em Estoque'] * df['Preço de Custo']).sum()
-    itens_alerta = df[df['Quantidade em Estoque'] <= df['Estoque Mínimo']].shape[0]; total_itens = df.shape[0]
+    # O card de alerta, o badge da sidebar e a lista de compras leem a mesma previsão de compras.
+    with medidor.etapa("lista de compras"): previsao = prever_compras(estado); lista_urgente = gerar_lista_de_compras(estado, previsao)
+    valor_total = estado.valor_total; itens_alerta = int(previsao['Comprar Agora'].sum()); total_itens = len(estado.valor_por_id)
     c1, c2, c3 = st.columns(3)
     c1.markdown(f'<div class="metric-card"><p><i class="fa-solid fa-coins"></i>Valor Total do Estoque</p><h3>R$ {valor_total:,.2f}</h3></div>', unsafe_allow_html=True)
     c2.markdown(f'<div class="metric-card"><p><i class="fa-solid fa-triangle-exclamation"></i>Itens em Alerta</p><h3>{itens_alerta}</h3></div>', unsafe_allow_html=True)
     c3.markdown(f'<div class="metric-card"><p><i class="fa-solid fa-boxes-stacked"></i>Total de Itens Únicos</p><h3>{total_itens}</h3></div>', unsafe_allow_html=True)
     st.subheader("Itens Precisando de Reposição Urgente")
-    if (lista_urgente := gerar_lista_de_compras()) is not None:
+    if lista_urgente is not None:
         st.dataframe(lista_urgente, use_container_width=True, hide_index=True)
+        st.subheader("Pedidos Sugeridos por Fornecedor")
+        st.dataframe(pedidos_por_fornecedor(previsao), use_container_width=True, hide_index=True, column_config={"Custo Estimado": st.column_config.NumberColumn(format="R$ %.2f"), "Menor Prazo (dias)": st.column_config.NumberColumn(format="%.0f")})
     else: st.success("🎉 Nenhum item precisa de reposição no momento!")
+    if (acabando := previsao[previsao['Dias até Acabar'] <= 14]).shape[0]:
+        st.subheader("Previsão de Ruptura (próximos 14 dias)")
+        st.dataframe(acabando.sort_values('Dias até Acabar')[['Nome do Item', 'Marca/Modelo', 'Quantidade em Estoque', 'Consumo Diário', 'Dias até Acabar', 'Último Uso']].round({'Consumo Diário': 2, 'Dias até Acabar': 0}), use_container_width=True, hide_index=True)
 
 def pagina_meu_estoque():
     c1, c2 = st.columns([3, 1]); c1.markdown("<h3><i class='fa-solid fa-box-archive'></i> Meu Estoque</h3>", unsafe_allow_html=True); c2.button("Adicionar Novo Item", on_click=set_page, args=("Adicionar Item",), use_container_width=True, type="primary")
     with st.expander("Configurar Colunas Visíveis"):
-        todas_colunas = [c for c in st.session_state.estoque_df.columns if c not in ['ID']]
-        colunas_selecionadas = st.multiselect("Selecione as colunas:", options=todas_colunas, default=st.session_state.get('colunas_visiveis', todas_colunas))
-        if colunas_selecionadas != st.session_state.get('colunas_visiveis'):
-            st.session_state.colunas_visiveis = colunas_selecionadas; salvar_dados(); st.rerun()
+        todas_colunas = [c for c in COLUNAS if c not in ['ID']]
+        colunas_selecionadas = st.multiselect("Selecione as colunas:", options=todas_colunas, default=estado.colunas_visiveis)
+        if colunas_selecionadas != estado.colunas_visiveis:
+            definir_colunas_visiveis(estado, colunas_selecionadas); st.rerun()
     
-    df_editavel = st.session_state.estoque_df.copy(); df_editavel["Excluir"] = False
+    with estado.lock: versao, estrutura, df_estoque = estado.versao, estado.versao_estrutura, estado.estoque_df
+    df_editavel = df_estoque[['ID'] + estado.colunas_visiveis].copy(); df_editavel["Excluir"] = False
+    for coluna in df_editavel.select_dtypes('category').columns: df_editavel[coluna] = df_editavel[coluna].astype('string')
     col_config = {
         "ID": st.column_config.NumberColumn(disabled=True), "Quantidade em Estoque": st.column_config.NumberColumn(format="%.2f", required=True),
         "Estoque Mínimo": st.column_config.NumberColumn(format="%d", required=True), "Preço de Custo": st.column_config.NumberColumn(format="R$ %.2f", required=True),
-        "Categoria": st.column_config.SelectboxColumn(options=st.session_state.categorias, required=True),
-        "Fornecedor Principal": st.column_config.SelectboxColumn(options=st.session_state.fornecedores, required=True),
+        "Categoria": st.column_config.SelectboxColumn(options=estado.categorias, required=True),
+        "Fornecedor Principal": st.column_config.SelectboxColumn(options=estado.fornecedores, required=True),
     }
-    df_modificado = st.data_editor(df_editavel[['ID'] + st.session_state.get('colunas_visiveis', []) + ['Excluir']], use_container_width=True, hide_index=True, key="data_editor", column_config=col_config)
+    # A base (IDs por posição + versões) é fixada quando a edição começa; o delta do editor é relativo a ela.
+    delta = st.session_state.get(chave_editor()) or {}
+    if not delta.get('edited_rows') or 'base_editor' not in st.session_state:
+        st.session_state.base_editor = {'ids': df_editavel['ID'].to_numpy(), 'versao': versao, 'estrutura': estrutura}
+    else:
+        # Com edição pendente a tabela mostra só os itens da base: os incluídos por outra sessão
+        # aparecem depois de salvar, e as posições do delta continuam apontando para os mesmos IDs.
+        df_editavel = df_editavel[df_editavel['ID'].isin(st.session_state.base_editor['ids'])]
+    st.data_editor(df_editavel, use_container_width=True, hide_index=True, key=chave_editor(), column_config=col_config)
     
     c1, c2 = st.columns([3, 1])
     if c1.button("Salvar Alterações", use_container_width=True, type="primary"):
-        itens_para_excluir = df_modificado[df_modificado["Excluir"] == True]["ID"].tolist()
-        df_alterado = df_modificado.drop(columns=["Excluir"]).set_index("ID")
-        df_original = st.session_state.estoque_df.set_index("ID")
-        df_original.update(df_alterado); st.session_state.estoque_df = df_original.reset_index()
-        if itens_para_excluir: st.session_state.estoque_df = st.session_state.estoque_df[~st.session_state.estoque_df['ID'].isin(itens_para_excluir)]
-        salvar_dados(); st.success("Alterações salvas com sucesso!"); st.rerun()
-    if not st.session_state.estoque_df.empty:
-        pdf_data = gerar_pdf_relatorio(st.session_state.estoque_df.drop(columns=['ID']), "Relatório de Estoque Completo")
+        base = st.session_state.base_editor
+        try: aplicar_edicoes(estado, eventos_do_editor(base['ids'], delta.get('edited_rows', {})), base['versao'], base['estrutura'])
+        except ValueError as e: st.error(f"Nenhuma alteração foi salva. {e}")
+        else:
+            st.session_state.rev_editor = st.session_state.get('rev_editor', 0) + 1; del st.session_state.base_editor
+            st.success("Alterações salvas com sucesso!"); st.rerun()
+    if not df_estoque.empty:
+        pdf_data = pdf_sob_demanda(versao, df_estoque, "Relatório de Estoque Completo", colunas=COLUNAS[1:])
         c2.download_button("Baixar Relatório PDF", pdf_data, f"relatorio_estoque_{date.today()}.pdf", "application/pdf", use_container_width=True)
 
 def pagina_adicionar_item():
@@ -223,40 +191,46 @@ def pagina_adicionar_item():
     with st.form("novo_item_form", clear_on_submit=True):
         c1, c2 = st.columns(2)
         nome=c1.text_input("Nome do Item*"); marca=c1.text_input("Marca/Modelo"); especificacao=c1.text_input("Tipo/Especificação")
-        cat=c2.selectbox("Categoria*",st.session_state.categorias); forn=c2.selectbox("Fornecedor Principal*",st.session_state.fornecedores); un=c2.text_input("Unidade de Medida*")
+        cat=c2.selectbox("Categoria*",estado.categorias); forn=c2.selectbox("Fornecedor Principal*",estado.fornecedores); un=c2.text_input("Unidade de Medida*")
         c3, c4 = st.columns(2)
         pr=c3.number_input("Preço de Custo (R$)*", min_value=0.0, format="%.2f"); qtd=c3.number_input("Quantidade em Estoque*", min_value=0.0)
         est_min=c4.number_input("Estoque Mínimo*", min_value=0); obs=c4.text_area("Observações Adicionais")
         if st.form_submit_button("Adicionar Item", use_container_width=True, type="primary"):
             if not all([nome, cat, forn, un]): st.error("Preencha os campos obrigatórios (*).")
-            else: adicionar_item(nome,marca,especificacao,cat,forn,qtd,est_min,un,pr,obs); st.success("✅ Item adicionado!")
+            else: adicionar_item(estado,nome,marca,especificacao,cat,forn,qtd,est_min,un,pr,obs); st.success("✅ Item adicionado!")
 
 def pagina_registrar_uso():
     st.markdown("<h3><i class='fa-solid fa-pen'></i> Registrar Uso de Material</h3>", unsafe_allow_html=True); c1, c2 = st.columns(2)
     with c1:
-        st.subheader("Adicionar Itens Consumidos"); df = st.session_state.estoque_df
-        if not df.empty:
-            itens_fmt = df.apply(lambda r: f"ID {r['ID']}: {r['Nome do Item']} ({r['Marca/Modelo']})", axis=1).tolist()
-            item_sel = st.selectbox("Buscar item no estoque:", ["Selecione..."] + itens_fmt)
-            if item_sel != "Selecione...":
-                item_id = int(item_sel.split(':')[0].replace('ID','').strip()); qtd = st.number_input("Quantidade utilizada:", 1.0, step=1.0, format="%.2f")
+        st.subheader("Adicionar Itens Consumidos"); indice = estado.indice_busca
+        if estado.posicao_por_id:
+            consulta = st.text_input("Buscar item no estoque:", placeholder="Nome, marca, especificação ou categoria")
+            # Sem consulta, só os primeiros itens por ID: listar todos custaria um format_func por item a cada rerun.
+            opcoes = indice.buscar(consulta) if consulta.strip() else indice.primeiros()
+            if not consulta.strip() and len(estado.posicao_por_id) > len(opcoes): st.caption(f"Mostrando os {len(opcoes)} primeiros itens. Digite para buscar entre todos.")
+            item_id = st.selectbox("Item:", opcoes, index=None, placeholder="Selecione..." if opcoes else "Nenhum item encontrado", format_func=lambda i: f"ID {i}: {indice.rotulos.get(i, '')}")
+            if item_id is not None:
+                qtd = st.number_input("Quantidade utilizada:", 1.0, step=1.0, format="%.2f")
                 if st.button("Adicionar à Sessão"):
-                    item_info = df[df['ID'] == item_id].iloc[0]
-                    st.session_state.sessao_uso.append({'id': item_id, 'nome': f"{item_info['Nome do Item']} ({item_info['Marca/Modelo']})", 'qtd': qtd}); st.rerun()
+                    st.session_state.sessao_uso.append({'id': item_id, 'nome': indice.rotulos.get(item_id, f"ID {item_id}"), 'qtd': qtd}); st.rerun()
     with c2:
         st.subheader("Itens da Sessão")
         if not st.session_state.sessao_uso: st.info("Nenhum item adicionado.")
         else:
             for item in st.session_state.sessao_uso: st.markdown(f"- **{item['qtd']}x** {item['nome']}")
             if st.button("Confirmar Uso", use_container_width=True, type="primary"):
-                for item in st.session_state.sessao_uso: registrar_uso(item['id'], item['qtd'])
-                st.session_state.sessao_uso = []; st.success("Baixa de estoque confirmada com sucesso!"); st.rerun()
+                try: registrar_uso_em_lote(estado, st.session_state.sessao_uso)
+                except ValueError as e: st.error(f"Nenhuma baixa foi feita. {e}")
+                else: st.session_state.sessao_uso = []; st.success("Baixa de estoque confirmada com sucesso!"); st.rerun()
 
 def pagina_lista_compras():
-    st.markdown("<h3><i class='fa-solid fa-cart-shopping'></i> Lista de Compras</h3>", unsafe_allow_html=True); st.write("Itens que atingiram o estoque mínimo.")
-    if (lista := gerar_lista_de_compras()) is not None:
+    st.markdown("<h3><i class='fa-solid fa-cart-shopping'></i> Lista de Compras</h3>", unsafe_allow_html=True); st.write("Itens no ponto de pedido, pelo estoque mínimo e pelo consumo recente, agrupados por fornecedor.")
+    # Sem segurar estado.lock: a chave do PDF vem da própria previsão, então fica coerente com a lista mesmo com escritas no meio.
+    with medidor.etapa("lista de compras"): versao, previsao = prever_compras(estado, com_chave=True); lista = gerar_lista_de_compras(estado, previsao)
+    if lista is not None:
+        st.dataframe(pedidos_por_fornecedor(previsao), use_container_width=True, hide_index=True, column_config={"Custo Estimado": st.column_config.NumberColumn(format="R$ %.2f"), "Menor Prazo (dias)": st.column_config.NumberColumn(format="%.0f")})
         st.dataframe(lista, use_container_width=True, hide_index=True)
-        pdf_data = gerar_pdf_relatorio(lista, "Lista de Compras"); st.download_button("Baixar Lista PDF", pdf_data, f"lista_compras_{date.today()}.pdf", "application/pdf")
+        pdf_data = pdf_sob_demanda(versao, lista, "Lista de Compras"); st.download_button("Baixar Lista PDF", pdf_data, f"lista_compras_{date.today()}.pdf", "application/pdf")
     else: st.success("🎉 Nenhum item precisa de reposição!")
 
 def pagina_gerenciar_cadastros():
@@ -266,37 +240,68 @@ def pagina_gerenciar_cadastros():
         with st.form("nova_cat_form", clear_on_submit=True):
             nova = st.text_input("Nova Categoria")
             if st.form_submit_button("Adicionar"):
-                if nova and nova not in st.session_state.categorias:
-                    st.session_state.categorias.append(nova); salvar_dados(); st.rerun()
+                if nova and alterar_cadastro(estado, 'categorias', nova): st.rerun()
                 else: st.error("Inválida ou já existe.")
-        if st.session_state.categorias:
-            sel = st.selectbox("Excluir", st.session_state.categorias, key="del_cat")
-            if st.button("Excluir Categoria"): st.session_state.categorias.remove(sel); salvar_dados(); st.rerun()
+        if estado.categorias:
+            sel = st.selectbox("Excluir", estado.categorias, key="del_cat")
+            if st.button("Excluir Categoria"): alterar_cadastro(estado, 'categorias', sel, remover=True); st.rerun()
     with c2:
         st.subheader("Fornecedores")
         with st.form("novo_forn_form", clear_on_submit=True):
             nova = st.text_input("Novo Fornecedor")
             if st.form_submit_button("Adicionar"):
-                if nova and nova not in st.session_state.fornecedores:
-                    st.session_state.fornecedores.append(nova); salvar_dados(); st.rerun()
+                if nova and alterar_cadastro(estado, 'fornecedores', nova): st.rerun()
                 else: st.error("Inválido ou já existe.")
-        if st.session_state.fornecedores:
-            sel = st.selectbox("Excluir", st.session_state.fornecedores, key="del_forn")
-            if st.button("Excluir Fornecedor"): st.session_state.fornecedores.remove(sel); salvar_dados(); st.rerun()
+        if estado.fornecedores:
+            sel = st.selectbox("Excluir", estado.fornecedores, key="del_forn")
+            if st.button("Excluir Fornecedor"): alterar_cadastro(estado, 'fornecedores', sel, remover=True); st.rerun()
+    if estado.sincronizador is not None:
+        status = estado.sincronizador.status(); envio = status['ultimo_envio']
+        st.caption(f"Google Sheets: {status['pendentes']} lote(s) na fila · último envio {envio:%d/%m %H:%M:%S}" if envio else f"Google Sheets: {status['pendentes']} lote(s) na fila · aguardando primeiro envio")
+        if status['ultimo_erro']: st.caption(f"Último erro da sincronização: {status['ultimo_erro']}")
+
+def pagina_desempenho():
+    # Página oculta (fora do menu), aberta com ?admin=desempenho na URL.
+    c1, c2 = st.columns([3, 1]); c1.markdown("<h3><i class='fa-solid fa-gauge-high'></i> Desempenho</h3>", unsafe_allow_html=True)
+    if c2.button("Voltar ao App", use_container_width=True): st.query_params.clear(); st.rerun()
+    # Registros avulsos (PDFs gerados no download) entram nas tabelas, mas não contam como reruns.
+    registros = medidor.registros(); totais = pd.Series([r['total_ms'] for r in registros if not r.get('avulso')], dtype=float)
+    if totais.empty: st.info("Nenhum rerun registrado ainda."); return
+    st.write(f"Últimos {len(totais)} reruns deste servidor (o buffer guarda até {medidor.reruns.maxlen} registros, PDFs incluídos).")
+    c1, c2, c3 = st.columns(3)
+    c1.markdown(f'<div class="metric-card"><p><i class="fa-solid fa-rotate"></i>Reruns</p><h3>{len(totais)}</h3></div>', unsafe_allow_html=True)
+    c2.markdown(f'<div class="metric-card"><p><i class="fa-solid fa-stopwatch"></i>p50 do Rerun</p><h3>{totais.quantile(0.5):,.1f} ms</h3></div>', unsafe_allow_html=True)
+    c3.markdown(f'<div class="metric-card"><p><i class="fa-solid fa-hourglass-half"></i>p95 do Rerun</p><h3>{totais.quantile(0.95):,.1f} ms</h3></div>', unsafe_allow_html=True)
+    st.subheader("Por Página"); st.dataframe(medidor.por_pagina(registros), use_container_width=True, hide_index=True)
+    st.subheader("Por Etapa")
+    filtro = st.selectbox("Página:", ["Todas"] + sorted({r['pagina'] for r in registros}))
+    st.dataframe(medidor.por_etapa(registros, None if filtro == "Todas" else filtro), use_container_width=True, hide_index=True)
+    st.subheader("Reruns Recentes"); st.dataframe(medidor.recentes(registros), use_container_width=True, hide_index=True)
+    c1, c2 = st.columns(2)
+    c1.download_button("Exportar JSON", medidor.exportar_json, f"desempenho_{date.today()}.json", "application/json", use_container_width=True)
+    if c2.button("Limpar Registros", use_container_width=True): medidor.limpar(); st.rerun()
 
 # --- INICIALIZAÇÃO E ROTEAMENTO ---
+with medidor.etapa("estado"): estado = obter_estado()
 if 'pagina_atual' not in st.session_state:
-    carregar_dados()
     st.session_state.pagina_atual = 'Painel Principal'
     st.session_state.sessao_uso = []
+st.session_state.versao_vista = estado.versao
 def set_page(page): st.session_state.pagina_atual = page
+def chave_editor(): return f"data_editor_{st.session_state.get('rev_editor', 0)}"
+
+@st.fragment(run_every=5)
+def vigiar_alteracoes():
+    # Re-renderiza a sessão só quando outra sessão alterou o estoque (e não há edição pendente na tabela).
+    edicao_pendente = st.session_state.get('pagina_atual') == 'Meu Estoque' and (st.session_state.get(chave_editor()) or {}).get('edited_rows')
+    if estado.versao != st.session_state.get('versao_vista') and not edicao_pendente: st.rerun()
 
 # --- RENDERIZAÇÃO DA INTERFACE ---
-with st.sidebar:
+with st.sidebar, medidor.etapa("sidebar"):
     st.markdown('<div class="sidebar-header"><span class="sidebar-icon"><i class="fa-solid fa-skull"></i></span><h3>Tattoo Estoque</h3></div>', unsafe_allow_html=True)
     st.markdown('<div class="sidebar-menu">', unsafe_allow_html=True)
-    num_itens_comprar = len(gerar_lista_de_compras()) if gerar_lista_de_compras() is not None else 0
-    carregar_componentes_visuais(num_itens_comprar)
+    with medidor.etapa("badge"): num_itens_comprar = int(prever_compras(estado)['Comprar Agora'].sum())
+    with medidor.etapa("css"): carregar_componentes_visuais(num_itens_comprar)
     
     menu_items = ["Painel Principal", "Meu Estoque", "Adicionar Item", "Registrar Uso", "Lista de Compras", "Gerenciar Cadastros"]
     
@@ -304,12 +309,18 @@ with st.sidebar:
         st.button(item, on_click=set_page, args=(item,), key=f"btn_{item}", use_container_width=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
+    vigiar_alteracoes()
     st.markdown('<div class="sidebar-footer"><span class="footer-brand">Rá Paixão Tattoo</span><span class="footer-version">Versão 16.0 Final</span></div>', unsafe_allow_html=True)
 
 paginas = {
     "Painel Principal": pagina_painel_principal, "Meu Estoque": pagina_meu_estoque,
     "Adicionar Item": pagina_adicionar_item, "Registrar Uso": pagina_registrar_uso,
-    "Lista de Compras": pagina_lista_compras, "Gerenciar Cadastros": pagina_gerenciar_cadastros
+    "Lista de Compras": pagina_lista_compras, "Gerenciar Cadastros": pagina_gerenciar_cadastros,
+    "Desempenho": pagina_desempenho
 }
-paginas[st.session_state.pagina_atual]()
+pagina = "Desempenho" if st.query_params.get("admin") == "desempenho" else st.session_state.pagina_atual
+# st.rerun() dentro da página interrompe o script com uma exceção; o finally registra o rerun mesmo assim.
+try:
+    with medidor.etapa("página"): paginas[pagina]()
+finally: medidor.finalizar_rerun(pagina)
 
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import estoque_core as core
+from analise_consumo import AnaliseConsumo, pedidos_por_fornecedor
+
+# --- BENCHMARK DO NÚCLEO DO ESTOQUE ---
+# Gera estoques sintéticos (por padrão 1k, 10k e 100k itens) e fluxos de uso, e mede latência e
+# vazão dos caminhos quentes do app, sem Streamlit: carga, inclusão de item, baixa em lote,
+# lista de compras, agregados do painel, gravação completa e PDF. Cada tamanho roda numa pasta
+# temporária própria, com semente fixa, então duas execuções na mesma máquina são comparáveis.
+#
+#   python benchmarks/bench_estoque.py
+#   python benchmarks/bench_estoque.py --tamanhos 1000 10000 --armazenamento csv --saida base.json
+#   python benchmarks/bench_estoque.py --comparar base.json   # sai com código 1 se algo piorou
+# Em operações que processam vários itens de uma vez (histórico, PDF), ops/s conta itens.
+CATEGORIAS = ["Agulhas", "Tintas", "Descartáveis", "Higiene", "Biqueiras", "Grips", "Cuidados"]
+FORNECEDORES = [f"Fornecedor {n:02d}" for n in range(1, 21)]
+UNIDADES = ["Unidade", "ml", "Par", "Caixa", "Rolo"]
+
+def gerar_inventario(n, rng):
+    return pd.DataFrame({
+        "ID": np.arange(1, n + 1), "Nome do Item": [f"Item {i}" for i in range(1, n + 1)],
+        "Marca/Modelo": rng.choice(["Cheyenne", "Dynamic", "Talge", "Electric Ink", "Solid Ink"], n),
+        "Tipo/Especificação": [f"{t}RL" for t in rng.integers(1, 15, n)],
+        "Categoria": rng.choice(CATEGORIAS, n), "Fornecedor Principal": rng.choice(FORNECEDORES, n),
+        "Quantidade em Estoque": rng.integers(0, 300, n).astype(float), "Estoque Mínimo": rng.integers(5, 60, n),
+        "Unidade de Medida": rng.choice(UNIDADES, n), "Preço de Custo": rng.uniform(0.2, 80.0, n).round(2),
+        "Data da Última Compra": date.today().isoformat(), "Observações": "",
+    })
+
+def gerar_historico(n, eventos, rng, dias=90):
+    # Baixas espalhadas pelos últimos `dias`, com poucos itens concentrando o uso (como no estúdio).
+    ids = np.minimum(rng.zipf(1.3, eventos), n); hoje = datetime.now()
+    idades = rng.integers(0, dias, eventos); qtds = rng.integers(1, 6, eventos)
+    return [{'op': 'consumo', 'id': int(i), 'qtd': float(q), 'ts': (hoje - timedelta(days=int(d))).isoformat(timespec='seconds')}
+            for i, q, d in zip(ids, qtds, idades)]
+
+def gerar_sessoes(n, quantidade, rng):
+    return [[{'id': int(i), 'qtd': float(rng.integers(1, 4))} for i in rng.integers(1, n + 1, rng.integers(1, 9))] for _ in range(quantidade)]
+
+def criar_armazenamento(tipo):
+    return core.ArmazenamentoCSV() if tipo == 'csv' else core.ArmazenamentoSQLite()
+
+def semear(tipo, n, rng):
+    estado = core.EstadoEstoque(criar_armazenamento(tipo))
+    estado.categorias = list(CATEGORIAS); estado.fornecedores = list(FORNECEDORES); estado.colunas_visiveis = list(core.COLUNAS_PADRAO)
+    estado.estoque_df = core._tipar(gerar_inventario(n, rng), estado.categorias, estado.fornecedores)
+    core.reconstruir_indices(estado)
+    return estado
+
+def medir(funcao, repeticoes, preparar=None):
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar: preparar()
+        inicio = time.perf_counter(); funcao(); tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+def resumir(nome, tempos, itens_por_operacao=1):
+    ordenados = sorted(tempos); total = sum(tempos)
+    return {'operacao': nome, 'n': len(tempos), 'p50_ms': statistics.median(ordenados) * 1000,
+            'p95_ms': ordenados[min(len(ordenados) - 1, int(round(0.95 * (len(ordenados) - 1))))] * 1000,
+            'max_ms': ordenados[-1] * 1000, 'ops_s': len(tempos) * itens_por_operacao / total if total else float('inf')}
+
+def painel(estado):
+    # O que pagina_painel_principal() calcula a cada render.
+    previsao = core.prever_compras(estado)
+    return estado.valor_total, int(previsao['Comprar Agora'].sum()), len(estado.valor_por_id), core.gerar_lista_de_compras(estado, previsao), pedidos_por_fornecedor(previsao)
+
+def rodar_tamanho(n, args):
+    rng = np.random.default_rng(args.semente + n); resultados = []
+    estado = semear(args.armazenamento, n, rng)
+    resultados.append(resumir("gravar tudo", medir(lambda: core.salvar_dados(estado), args.repeticoes)))
+    resultados.append(resumir("carregar", medir(lambda: core.abrir_estoque(criar_armazenamento(args.armazenamento), sincronizar=False), args.repeticoes)))
+    estado = core.abrir_estoque(criar_armazenamento(args.armazenamento), sincronizar=False)
+
+    historico = gerar_historico(n, args.historico, rng)
+    resultados.append(resumir("análise: histórico", medir(lambda: AnaliseConsumo(historico).obter_taxas(), args.repeticoes), len(historico)))
+    estado.analise = AnaliseConsumo(historico)
+
+    novos = iter(range(args.operacoes * args.repeticoes + 1))
+    resultados.append(resumir("incluir item", medir(lambda: core.adicionar_item(estado, f"Novo {next(novos)}", "Marca", "Spec", CATEGORIAS[0], FORNECEDORES[0], 10, 5, "Unidade", 1.5), args.operacoes)))
+
+    sessoes = iter(gerar_sessoes(n, args.operacoes, rng))
+    resultados.append(resumir("baixa em lote", medir(lambda: core.registrar_uso_em_lote(estado, next(sessoes)), args.operacoes)))
+
+    # Frio: cada medição vem logo depois de uma baixa, como no rerun que segue a confirmação de uso.
+    alterar = lambda: core.registrar_uso(estado, int(rng.integers(1, n + 1)), 1.0)
+    resultados.append(resumir("lista de compras (fria)", medir(lambda: core.gerar_lista_de_compras(estado), args.repeticoes * 4, alterar)))
+    resultados.append(resumir("lista de compras (cache)", medir(lambda: core.gerar_lista_de_compras(estado), args.repeticoes * 4)))
+    resultados.append(resumir("agregados do painel (frio)", medir(lambda: painel(estado), args.repeticoes * 4, alterar)))
+    resultados.append(resumir("agregados do painel (cache)", medir(lambda: painel(estado), args.repeticoes * 4)))
+
+    resultados.append(resumir("busca de itens", medir(lambda: estado.indice_busca.buscar(f"item {rng.integers(1, n)}"), args.operacoes)))
+    if n <= args.pdf_ate:
+        relatorio = estado.estoque_df[core.COLUNAS[1:]]
+        resultados.append(resumir("PDF do estoque", medir(lambda: core.gerar_pdf_relatorio(relatorio, "Relatório de Estoque Completo"), max(1, args.repeticoes // 2)), len(relatorio)))
+    lista = core.gerar_lista_de_compras(estado)
+    if lista is not None: resultados.append(resumir("PDF da lista de compras", medir(lambda: core.gerar_pdf_relatorio(lista, "Lista de Compras"), args.repeticoes)))
+    return resultados
+
+def imprimir(n, resultados):
+    print(f"\n== {n:,} itens ==".replace(",", "."))
+    print(f"{'operação':<30}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'max ms':>11}{'ops/s':>12}")
+    for r in resultados: print(f"{r['operacao']:<30}{r['n']:>6}{r['p50_ms']:>11.2f}{r['p95_ms']:>11.2f}{r['max_ms']:>11.2f}{r['ops_s']:>12.1f}")
+
+def comparar(atual, base, tolerancia):
+    # Compara p50 com uma execução anterior (--saida) e lista o que ficou mais lento que a tolerância.
+    anteriores = {(r['tamanho'], r['operacao']): r for r in base['resultados']}; pioras = []
+    for r in atual:
+        antes = anteriores.get((r['tamanho'], r['operacao']))
+        if antes and r['p50_ms'] > antes['p50_ms'] * (1 + tolerancia) and r['p50_ms'] - antes['p50_ms'] > 0.5:
+            pioras.append(f"{r['tamanho']} itens / {r['operacao']}: p50 {antes['p50_ms']:.2f} -> {r['p50_ms']:.2f} ms")
+    return pioras
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos quentes do estoque (sem Streamlit).")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--armazenamento", choices=["sqlite", "csv"], default="sqlite")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--operacoes", type=int, default=200, help="inclusões, baixas e buscas medidas por tamanho")
+    parser.add_argument("--historico", type=int, default=50000, help="eventos de consumo sintéticos dos últimos 90 dias")
+    parser.add_argument("--pdf-ate", type=int, default=10000, help="maior estoque para o qual o PDF completo é gerado")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+
+    todos = []; pasta_original = os.getcwd()
+    for n in args.tamanhos:
+        with tempfile.TemporaryDirectory(prefix="bench_estoque_") as pasta:
+            os.chdir(pasta)  # os arquivos do estoque usam caminhos relativos
+            try: resultados = rodar_tamanho(n, args)
+            finally: os.chdir(pasta_original)
+        imprimir(n, resultados); todos += [{'tamanho': n, **r} for r in resultados]
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({'data': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0], 'pandas': pd.__version__,
+                       'parametros': {k: v for k, v in vars(args).items() if k not in ('saida', 'comparar')}, 'resultados': todos}, f, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f: base = json.load(f)
+        if base['parametros'].get('armazenamento') != args.armazenamento:
+            print(f"\nAviso: a base usou armazenamento {base['parametros'].get('armazenamento')!r}, esta execução {args.armazenamento!r}.")
+        pioras = comparar(todos, base, args.tolerancia)
+        if pioras:
+            print("\nRegressões (p50 acima da tolerância):"); print("\n".join(f"  - {p}" for p in pioras)); sys.exit(1)
+        print("\nSem regressões em relação a", args.comparar)
+
+if __name__ == "__main__":
+    main()
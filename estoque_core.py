@@ -0,0 +1,637 @@
+import pandas as pd
+from datetime import date, datetime
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+import os
+import json
+import threading
+import re
+import bisect
+import difflib
+import itertools
+import unicodedata
+import sqlite3
+from sincronizacao_planilhas import SincronizadorPlanilhas, abrir_planilha
+from analise_consumo import AnaliseConsumo, OPERACOES, inicio_das_janelas
+from instrumentacao import medidor
+
+# --- NÚCLEO DO ESTOQUE ---
+# Tudo o que não é interface: estado compartilhado, índices, persistência, regras de negócio e o
+# relatório em PDF. Não depende do Streamlit, então pode ser importado por scripts, testes e pelos
+# benchmarks (benchmarks/bench_estoque.py). O app_estoque_online.py só monta as páginas em cima disto.
+
+# --- CONSTANTES DE ARQUIVOS ---
+ESTOQUE_FILE = 'estoque.csv'
+CADASTROS_FILE = 'cadastros.json'
+DIARIO_FILE = 'movimentos.jsonl'
+HISTORICO_FILE = 'movimentos_historico.jsonl'
+ESTOQUE_DB = 'estoque.db'
+COMPACTAR_A_CADA = 200
+RESSINCRONIZAR_VALOR_A_CADA = 500
+ARMAZENAMENTO = os.environ.get('ESTOQUE_ARMAZENAMENTO', 'sqlite')  # 'sqlite' ou 'csv'
+COLUNAS = ["ID", "Nome do Item", "Marca/Modelo", "Tipo/Especificação", "Categoria", "Fornecedor Principal", "Quantidade em Estoque", "Estoque Mínimo", "Unidade de Medida", "Preço de Custo", "Data da Última Compra", "Observações"]
+
+# --- ESTADO COMPARTILHADO ---
+# Um único EstadoEstoque por processo, compartilhado por todas as sessões (tablets); no app ele
+# vem de obter_estado(), com st.cache_resource. Toda escrita acontece sob `lock` e troca o
+# DataFrame por um novo, nunca altera o atual no lugar, então quem está lendo sempre vê uma
+# versão consistente.
+# `versao` aumenta a cada alteração e permite às sessões saber quando precisam re-renderizar.
+# `valor_por_id` e `valor_total` são mantidos incrementalmente a cada alteração, para que os
+# cards do painel não precisem varrer o estoque a cada rerun. Itens em alerta, badge da sidebar
+# e lista de compras vêm todos da previsão de compras (`analise`), que tem o próprio cache.
+# `posicao_por_id` leva do ID à linha no DataFrame e `indice_busca` atende o seletor de itens.
+# `analise` acumula os movimentos gravados e fornece as taxas de consumo e a previsão de compra.
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).lower()
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+class IndiceBusca:
+    # Índice invertido de tokens (nome, marca, especificação e categoria) com busca por prefixo
+    # e aproximada; `vocabulario` fica ordenado para achar os prefixos com bisect. `ids` guarda os
+    # IDs em ordem, para a lista padrão do seletor (antes de digitar) não depender da ordem de edição.
+    CAMPOS = ['Nome do Item', 'Marca/Modelo', 'Tipo/Especificação', 'Categoria']
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rotulos = {}; self.nomes = {}; self.tokens_por_id = {}; self.ids_por_token = {}; self.vocabulario = []; self.ids = []
+
+    def atualizar(self, linhas):
+        colunas = [linhas[c].astype(object).fillna('').astype(str).tolist() for c in self.CAMPOS]
+        with self.lock:
+            for item_id, nome, marca, especificacao, categoria in zip(linhas['ID'].astype(int).tolist(), *colunas):
+                if item_id in self.tokens_por_id: self._remover(item_id)
+                else: bisect.insort(self.ids, item_id)
+                tokens = set(re.findall(r'\w+', _normalizar(f"{nome} {marca} {especificacao} {categoria}")))
+                self.rotulos[item_id] = f"{nome} ({marca})"; self.nomes[item_id] = _normalizar(nome); self.tokens_por_id[item_id] = tokens
+                for token in tokens:
+                    if token not in self.ids_por_token: self.ids_por_token[token] = set(); bisect.insort(self.vocabulario, token)
+                    self.ids_por_token[token].add(item_id)
+
+    def remover(self, ids):
+        with self.lock:
+            for item_id in ids:
+                if item_id in self.tokens_por_id: self._remover(item_id); del self.ids[bisect.bisect_left(self.ids, item_id)]
+
+    def _remover(self, item_id):
+        for token in self.tokens_por_id.pop(item_id, ()):
+            ids = self.ids_por_token[token]; ids.discard(item_id)
+            if not ids: del self.ids_por_token[token]; del self.vocabulario[bisect.bisect_left(self.vocabulario, token)]
+        self.rotulos.pop(item_id, None); self.nomes.pop(item_id, None)
+
+    def primeiros(self, limite=50):
+        with self.lock: return self.ids[:limite]
+
+    def buscar(self, consulta, limite=50):
+        termos = re.findall(r'\w+', _normalizar(consulta))
+        if not termos: return []
+        with self.lock:
+            pontos = {}; acertos = {}
+            for termo in termos:
+                encontrados = {}
+                inicio = bisect.bisect_left(self.vocabulario, termo)
+                for token in itertools.takewhile(lambda t: t.startswith(termo), self.vocabulario[inicio:inicio + 200]):
+                    peso = 3 if token == termo else 2
+                    for item_id in self.ids_por_token[token]: encontrados[item_id] = max(encontrados.get(item_id, 0), peso)
+                if not encontrados:
+                    for token in difflib.get_close_matches(termo, self.vocabulario, n=5, cutoff=0.75):
+                        for item_id in self.ids_por_token[token]: encontrados[item_id] = 1
+                for item_id, peso in encontrados.items():
+                    pontos[item_id] = pontos.get(item_id, 0) + peso; acertos[item_id] = acertos.get(item_id, 0) + 1
+            inicio_nome = ' '.join(termos)
+            for item_id in pontos:
+                if self.nomes[item_id].startswith(inicio_nome): pontos[item_id] += 2
+            ordem = sorted(pontos, key=lambda i: (-acertos[i], -pontos[i], self.nomes[i]))
+            return ordem[:limite]
+
+class EstadoEstoque:
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento; self.lock = threading.RLock(); self.versao = 0
+        self.estoque_df = pd.DataFrame(columns=COLUNAS)
+        self.categorias = []; self.fornecedores = []; self.colunas_visiveis = []
+        self.seq_movimentos = 0; self.seq_snapshot = 0; self.eventos_no_diario = 0
+        self.valor_por_id = {}; self.valor_total = 0.0; self.alteracoes_desde_ressincronia = 0
+        self.posicao_por_id = {}; self.indice_busca = IndiceBusca()
+        self.versao_estrutura = 0; self.versao_celulas = {}
+        self.ouvintes = []; self.sincronizador = None; self.analise = AnaliseConsumo()
+
+def _indexar_itens(estado, linhas, textos=True):
+    # `linhas` são os itens novos ou alterados, já com os valores finais. Consumo não mexe em
+    # texto, então passa textos=False e pula o índice de busca.
+    if textos: estado.indice_busca.atualizar(linhas)
+    ids = linhas['ID'].astype(int).tolist()
+    valores = (linhas['Quantidade em Estoque'] * linhas['Preço de Custo']).fillna(0.0).tolist()
+    for item_id, valor in zip(ids, valores):
+        estado.valor_total += valor - estado.valor_por_id.get(item_id, 0.0); estado.valor_por_id[item_id] = valor
+
+def _desindexar_itens(estado, ids):
+    estado.indice_busca.remover(ids)
+    for item_id in ids: estado.valor_total -= estado.valor_por_id.pop(item_id, 0.0)
+
+def _reposicionar(estado):
+    estado.posicao_por_id = {item_id: pos for pos, item_id in enumerate(estado.estoque_df['ID'].astype(int).tolist())}
+
+def reconstruir_indices(estado):
+    estado.valor_por_id = {}; estado.valor_total = 0.0; estado.alteracoes_desde_ressincronia = 0; estado.indice_busca = IndiceBusca()
+    _reposicionar(estado); _indexar_itens(estado, estado.estoque_df)
+
+def _linhas_planilha(df):
+    return df[COLUNAS].astype(object).where(df[COLUNAS].notna(), None).values.tolist()
+
+def _espelhar_na_planilha(estado, ids, excluidos):
+    ids = [i for i in ids if i in estado.posicao_por_id]
+    linhas = _linhas_planilha(estado.estoque_df.iloc[[estado.posicao_por_id[i] for i in ids]]) if ids else []
+    estado.sincronizador.enfileirar(linhas, excluidos)
+
+def ligar_sincronizacao(estado):
+    # Opcional: só liga com GOOGLE_SHEETS_PLANILHA definido. A planilha é aberta na thread do worker.
+    nome = os.environ.get('GOOGLE_SHEETS_PLANILHA')
+    if not nome: return
+    credenciais = os.environ.get('GOOGLE_SHEETS_CREDENCIAIS', 'credenciais.json')
+    estado.sincronizador = SincronizadorPlanilhas(lambda: abrir_planilha(nome, credenciais), COLUNAS, lambda: _linhas_planilha(estado.estoque_df))
+    estado.ouvintes.append(_espelhar_na_planilha); estado.sincronizador.ressincronizar()
+
+def abrir_estoque(armazenamento=None, sincronizar=True):
+    estado = EstadoEstoque(armazenamento or obter_armazenamento()); carregar_dados(estado)
+    if sincronizar: ligar_sincronizacao(estado)
+    return estado
+# --- FUNÇÕES DE PERSISTÊNCIA ---
+# A persistência fica atrás de um "armazenamento" com a mesma interface em dois formatos:
+#   - ArmazenamentoSQLite (padrão): tabelas tipadas e indexadas; cada ação do usuário é uma
+#     transação que grava os movimentos e faz upsert/delete só das linhas afetadas.
+#   - ArmazenamentoCSV (legado): snapshot (estoque.csv + cadastros.json) mais um diário
+#     append-only (movimentos.jsonl), compactado a cada COMPACTAR_A_CADA eventos e arquivado
+#     em movimentos_historico.jsonl. A primeira linha do estoque.csv ('#seq_snapshot=N') diz
+#     até qual evento o snapshot já cobre; como vai no mesmo arquivo, é gravada atomicamente
+#     com ele e uma queda no meio da compactação nunca reaplica eventos já incluídos.
+# Na primeira execução com SQLite, os arquivos CSV/JSON existentes são migrados uma única vez.
+TIPOS_COLUNAS = {
+    "ID": "int64", "Nome do Item": "string", "Marca/Modelo": "string", "Tipo/Especificação": "string",
+    "Categoria": "category", "Fornecedor Principal": "category", "Quantidade em Estoque": "float64",
+    "Estoque Mínimo": "int64", "Unidade de Medida": "category", "Preço de Custo": "float64",
+    "Data da Última Compra": "string", "Observações": "string"
+}
+COLUNAS_PADRAO = ['Nome do Item', 'Marca/Modelo', 'Categoria', 'Quantidade em Estoque']
+CAMPOS_OBRIGATORIOS = ["Nome do Item", "Categoria", "Fornecedor Principal", "Quantidade em Estoque", "Estoque Mínimo", "Unidade de Medida", "Preço de Custo"]
+
+def _tipar(df, categorias=(), fornecedores=()):
+    # Aplica os tipos de TIPOS_COLUNAS; as categorias incluem os cadastros mesmo sem itens ainda.
+    extras = {"Categoria": list(categorias), "Fornecedor Principal": list(fornecedores), "Unidade de Medida": []}
+    colunas = {}
+    for coluna, tipo in TIPOS_COLUNAS.items():
+        serie = df[coluna] if coluna in df else pd.Series([None] * len(df), index=df.index, dtype=object)
+        if tipo == "category":
+            valores = serie.astype(object).where(serie.notna(), None)
+            colunas[coluna] = pd.Categorical(valores, categories=pd.unique(pd.Series(extras[coluna] + [v for v in valores.unique() if v is not None], dtype=object)))
+        elif tipo == "int64": colunas[coluna] = pd.to_numeric(serie).fillna(0).astype("int64")
+        elif tipo == "float64": colunas[coluna] = pd.to_numeric(serie).astype("float64")
+        else: colunas[coluna] = serie.astype("string")
+    return pd.DataFrame(colunas, index=df.index).reset_index(drop=True)
+
+def _garantir_categorias(df, valores):
+    # Acrescenta às colunas categóricas os valores novos, sem reconverter a coluna inteira.
+    copiado = False
+    for coluna, valor in valores.items():
+        if coluna in df and isinstance(df[coluna].dtype, pd.CategoricalDtype) and valor is not None and not pd.isna(valor) and valor not in df[coluna].cat.categories:
+            if not copiado: df = df.copy(deep=False); copiado = True
+            df[coluna] = df[coluna].cat.add_categories([valor])
+    return df
+
+def _valor_json(valor):
+    return valor.item() if hasattr(valor, 'item') else str(valor)
+
+def _valor_sql(valor):
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)): return None
+    return valor.item() if hasattr(valor, 'item') else valor
+
+def _escrever_atomico(caminho, conteudo):
+    tmp = f"{caminho}.tmp"
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        f.write(conteudo); f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, caminho)
+
+def reparar_diario(caminho=DIARIO_FILE):
+    # Corta uma última linha incompleta (queda durante a escrita). Sem isso o próximo append seria
+    # colado no fragmento e todos os eventos seguintes se perderiam na leitura.
+    if not os.path.exists(caminho): return
+    with open(caminho, 'rb+') as f:
+        conteudo = f.read(); fim = 0
+        for linha in conteudo.splitlines(keepends=True):
+            if not linha.endswith(b'\n'): break
+            try: json.loads(linha)
+            except ValueError: break
+            fim += len(linha)
+        if fim < len(conteudo): f.truncate(fim); f.flush(); os.fsync(f.fileno())
+
+def ler_diario(caminho=DIARIO_FILE, ops=None):
+    # Com `ops`, linhas de outras operações são puladas antes do json.loads (as de 'entrada' e 'edicao' são as maiores).
+    eventos = []; marcas = [f'"op": "{op}"' for op in ops or ()]
+    if not os.path.exists(caminho): return eventos
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if marcas and not any(marca in linha for marca in marcas): continue
+            try: eventos.append(json.loads(linha))
+            except json.JSONDecodeError: break  # última linha incompleta (queda durante a escrita)
+    return eventos
+
+def reaplicar_movimentos(df, eventos):
+    if not eventos: return df
+    itens = {int(r['ID']): r for r in df.to_dict('records')}
+    for evento in eventos:
+        op = evento['op']
+        if op == 'entrada': itens[int(evento['item']['ID'])] = dict(evento['item'])
+        elif evento['id'] not in itens: continue
+        elif op == 'consumo': itens[evento['id']]['Quantidade em Estoque'] -= float(evento['qtd'])
+        elif op == 'edicao': itens[evento['id']].update(evento['campos'])
+        elif op == 'exclusao': del itens[evento['id']]
+    return pd.DataFrame(list(itens.values()), columns=COLUNAS)
+
+class ArmazenamentoCSV:
+    def existe(self):
+        return os.path.exists(ESTOQUE_FILE) and os.path.exists(CADASTROS_FILE)
+
+    def carregar(self, estado):
+        with open(CADASTROS_FILE, 'r', encoding='utf-8') as f: cadastros = json.load(f)
+        estado.categorias = cadastros.get('categorias', []); estado.fornecedores = cadastros.get('fornecedores', [])
+        estado.colunas_visiveis = cadastros.get('colunas_visiveis', COLUNAS_PADRAO)
+        with open(ESTOQUE_FILE, 'r', encoding='utf-8') as f: primeira = f.readline()
+        marcado = primeira.startswith('#seq_snapshot=')
+        # Snapshots antigos, sem a marca na primeira linha, guardavam o seq no cadastros.json.
+        estado.seq_snapshot = int(primeira.strip().split('=', 1)[1]) if marcado else cadastros.get('seq_snapshot', 0)
+        df = pd.read_csv(ESTOQUE_FILE, skiprows=1 if marcado else 0, dtype={c: ("string" if t == "category" else t) for c, t in TIPOS_COLUNAS.items() if t != "int64"})
+        reparar_diario(HISTORICO_FILE); reparar_diario(DIARIO_FILE)
+        pendentes = [e for e in ler_diario() if e['seq'] > estado.seq_snapshot]
+        estado.estoque_df = _tipar(reaplicar_movimentos(df, pendentes), estado.categorias, estado.fornecedores)
+        estado.seq_movimentos = pendentes[-1]['seq'] if pendentes else estado.seq_snapshot
+        estado.eventos_no_diario = len(pendentes)
+
+    def gravar_movimentos(self, estado, eventos):
+        linhas = [json.dumps(evento, ensure_ascii=False, default=_valor_json) for evento in eventos]
+        with open(DIARIO_FILE, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(linhas) + '\n'); f.flush(); os.fsync(f.fileno())
+        estado.eventos_no_diario += len(eventos)
+
+    def salvar_cadastros(self, estado):
+        cadastros = {'categorias': estado.categorias, 'fornecedores': estado.fornecedores, 'colunas_visiveis': estado.colunas_visiveis}
+        _escrever_atomico(CADASTROS_FILE, json.dumps(cadastros, ensure_ascii=False))
+
+    def salvar_tudo(self, estado):
+        # Snapshot completo: grava o estoque junto com até qual evento ele cobre e arquiva o diário.
+        _escrever_atomico(ESTOQUE_FILE, f"#seq_snapshot={estado.seq_movimentos}\n" + estado.estoque_df.to_csv(index=False))
+        estado.seq_snapshot = estado.seq_movimentos; self.salvar_cadastros(estado)
+        if os.path.exists(DIARIO_FILE):
+            with open(DIARIO_FILE, 'r', encoding='utf-8') as origem, open(HISTORICO_FILE, 'a', encoding='utf-8') as destino:
+                destino.write(origem.read()); destino.flush(); os.fsync(destino.fileno())
+            os.remove(DIARIO_FILE)
+        estado.eventos_no_diario = 0
+
+    def manutencao(self, estado):
+        if estado.eventos_no_diario >= COMPACTAR_A_CADA: self.salvar_tudo(estado)
+
+    def ler_movimentos(self):
+        # Uma queda durante o arquivamento pode deixar eventos no histórico e no diário ao mesmo tempo.
+        vistos = set(); eventos = []
+        for evento in ler_diario(HISTORICO_FILE) + ler_diario(DIARIO_FILE):
+            if evento['seq'] not in vistos: vistos.add(evento['seq']); eventos.append(evento)
+        return eventos
+
+    def ler_consumo(self, desde):
+        # Eventos da análise a partir de `desde`; dos anteriores, só os itens que já tinham uso (ID -> ts).
+        vistos = set(); eventos = []; anteriores = {}
+        for evento in ler_diario(HISTORICO_FILE, OPERACOES) + ler_diario(DIARIO_FILE, OPERACOES):
+            if evento['seq'] in vistos or evento['op'] not in OPERACOES: continue
+            vistos.add(evento['seq'])
+            if evento['ts'] >= desde: eventos.append(evento)
+            elif evento['op'] == 'exclusao': anteriores.pop(evento['id'], None)
+            elif evento.get('qtd'): anteriores[evento['id']] = evento['ts']
+        return eventos, anteriores
+
+class ArmazenamentoSQLite:
+    CAMPOS = {
+        "ID": "id", "Nome do Item": "nome", "Marca/Modelo": "marca", "Tipo/Especificação": "especificacao",
+        "Categoria": "categoria", "Fornecedor Principal": "fornecedor", "Quantidade em Estoque": "quantidade",
+        "Estoque Mínimo": "estoque_minimo", "Unidade de Medida": "unidade", "Preço de Custo": "preco_custo",
+        "Data da Última Compra": "data_ultima_compra", "Observações": "observacoes"
+    }
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS itens (
+            id INTEGER PRIMARY KEY, nome TEXT NOT NULL, marca TEXT, especificacao TEXT, categoria TEXT,
+            fornecedor TEXT, quantidade REAL NOT NULL DEFAULT 0, estoque_minimo INTEGER NOT NULL DEFAULT 0,
+            unidade TEXT, preco_custo REAL NOT NULL DEFAULT 0, data_ultima_compra TEXT, observacoes TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_itens_categoria ON itens (categoria);
+        CREATE INDEX IF NOT EXISTS idx_itens_fornecedor ON itens (fornecedor);
+        CREATE TABLE IF NOT EXISTS movimentos (
+            seq INTEGER PRIMARY KEY, ts TEXT NOT NULL, op TEXT NOT NULL, item_id INTEGER, qtd REAL, dados TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_movimentos_item ON movimentos (item_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_movimentos_op_ts ON movimentos (op, ts);
+        CREATE TABLE IF NOT EXISTS cadastros (chave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+    """
+
+    def __init__(self, caminho=ESTOQUE_DB):
+        self.caminho = caminho; self.lock = threading.Lock(); self.conexao = None
+
+    def existe(self):
+        return os.path.exists(self.caminho)
+
+    def _conectar(self):
+        if self.conexao is None:
+            self.conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+            self.conexao.execute("PRAGMA journal_mode=WAL"); self.conexao.execute("PRAGMA synchronous=FULL")
+            self.conexao.executescript(self.ESQUEMA)
+        return self.conexao
+
+    def carregar(self, estado):
+        with self.lock:
+            conexao = self._conectar()
+            cadastros = {chave: json.loads(valor) for chave, valor in conexao.execute("SELECT chave, valor FROM cadastros")}
+            df = pd.read_sql_query(f"SELECT {', '.join(self.CAMPOS.values())} FROM itens ORDER BY id", conexao)
+            estado.seq_movimentos = conexao.execute("SELECT COALESCE(MAX(seq), 0) FROM movimentos").fetchone()[0]
+        estado.categorias = cadastros.get('categorias', []); estado.fornecedores = cadastros.get('fornecedores', [])
+        estado.colunas_visiveis = cadastros.get('colunas_visiveis', COLUNAS_PADRAO)
+        estado.estoque_df = _tipar(df.rename(columns={v: k for k, v in self.CAMPOS.items()}), estado.categorias, estado.fornecedores)
+
+    def _upsert(self, conexao, registros):
+        campos = list(self.CAMPOS.values())
+        conexao.executemany(f"INSERT OR REPLACE INTO itens ({', '.join(campos)}) VALUES ({', '.join('?' * len(campos))})",
+                            [[_valor_sql(registro.get(c)) for c in self.CAMPOS] for registro in registros])
+
+    def gravar_movimentos(self, estado, eventos):
+        with self.lock, self._conectar() as conexao:
+            for evento in eventos:
+                op = evento['op']; item_id = evento['item']['ID'] if op == 'entrada' else evento['id']
+                dados = evento.get('item', evento.get('campos'))
+                conexao.execute("INSERT INTO movimentos (seq, ts, op, item_id, qtd, dados) VALUES (?, ?, ?, ?, ?, ?)",
+                                (evento['seq'], evento['ts'], op, _valor_sql(item_id), evento.get('qtd'), None if dados is None else json.dumps(dados, ensure_ascii=False, default=_valor_json)))
+                if op == 'entrada': self._upsert(conexao, [evento['item']])
+                elif op == 'consumo': conexao.execute("UPDATE itens SET quantidade = quantidade - ? WHERE id = ?", (float(evento['qtd']), item_id))
+                elif op == 'exclusao': conexao.execute("DELETE FROM itens WHERE id = ?", (item_id,))
+                elif op == 'edicao':
+                    campos = [c for c in evento['campos'] if c in self.CAMPOS and c != "ID"]
+                    if campos:
+                        conexao.execute(f"UPDATE itens SET {', '.join(f'{self.CAMPOS[c]} = ?' for c in campos)} WHERE id = ?",
+                                        [_valor_sql(evento['campos'][c]) for c in campos] + [item_id])
+
+    def _gravar_cadastros(self, conexao, estado):
+        valores = {'categorias': estado.categorias, 'fornecedores': estado.fornecedores, 'colunas_visiveis': estado.colunas_visiveis}
+        conexao.executemany("INSERT OR REPLACE INTO cadastros (chave, valor) VALUES (?, ?)", [(k, json.dumps(v, ensure_ascii=False)) for k, v in valores.items()])
+
+    def _gravar_estoque(self, conexao, estado):
+        conexao.execute("DELETE FROM itens"); self._upsert(conexao, estado.estoque_df.to_dict('records')); self._gravar_cadastros(conexao, estado)
+
+    def salvar_cadastros(self, estado):
+        with self.lock, self._conectar() as conexao: self._gravar_cadastros(conexao, estado)
+
+    def salvar_tudo(self, estado):
+        with self.lock, self._conectar() as conexao: self._gravar_estoque(conexao, estado)
+
+    def manutencao(self, estado):
+        pass
+
+    def ler_movimentos(self):
+        with self.lock:
+            linhas = self._conectar().execute("SELECT seq, ts, op, item_id, qtd, dados FROM movimentos ORDER BY seq").fetchall()
+        eventos = []
+        for seq, ts, op, item_id, qtd, dados in linhas:
+            evento = {'seq': seq, 'ts': ts, 'op': op}
+            if op == 'entrada': evento['item'] = json.loads(dados)
+            else: evento['id'] = item_id
+            if op == 'consumo': evento['qtd'] = qtd
+            if op == 'edicao': evento['campos'] = json.loads(dados)
+            eventos.append(evento)
+        return eventos
+
+    def ler_consumo(self, desde):
+        # Sem tocar na coluna `dados`: as cargas de 'entrada'/'edicao' e o histórico antigo não são decodificados.
+        filtro = ', '.join('?' * len(OPERACOES))
+        with self.lock:
+            conexao = self._conectar()
+            linhas = conexao.execute(f"SELECT seq, ts, op, item_id, qtd FROM movimentos WHERE op IN ({filtro}) AND ts >= ? ORDER BY seq", (*OPERACOES, desde)).fetchall()
+            # Último evento de cada item antes da janela: se for uma baixa, o item já tinha uso (e não foi excluído depois).
+            anteriores = dict(conexao.execute(
+                "SELECT m.item_id, m.ts FROM movimentos m JOIN (SELECT MAX(seq) AS seq FROM movimentos WHERE op IN ('consumo', 'exclusao') AND ts < ? AND (op = 'exclusao' OR qtd <> 0) GROUP BY item_id) u ON m.seq = u.seq WHERE m.op = 'consumo'",
+                (desde,)).fetchall())
+        return [{'seq': seq, 'ts': ts, 'op': op, 'id': item_id, 'qtd': qtd} for seq, ts, op, item_id, qtd in linhas], anteriores
+
+    def migrar_de(self, origem, estado):
+        # Migração única: carrega o snapshot + diário legado e grava tudo, com o histórico, numa só
+        # transação num arquivo temporário, que só no fim é renomeado para o banco. Uma falha no meio
+        # não deixa um banco parcial que existe() aceitaria; a próxima inicialização migra de novo.
+        origem.carregar(estado); movimentos = origem.ler_movimentos()
+        temporario = f"{self.caminho}.migrando"
+        with self.lock:
+            for sufixo in ("", "-journal"):
+                if os.path.exists(temporario + sufixo): os.remove(temporario + sufixo)
+            conexao = sqlite3.connect(temporario)
+            try:
+                conexao.execute("PRAGMA synchronous=FULL"); conexao.executescript(self.ESQUEMA)
+                with conexao:
+                    conexao.executemany("INSERT OR IGNORE INTO movimentos (seq, ts, op, item_id, qtd, dados) VALUES (?, ?, ?, ?, ?, ?)", [
+                        (e['seq'], e['ts'], e['op'], e['item']['ID'] if e['op'] == 'entrada' else e['id'], e.get('qtd'),
+                         None if e.get('item', e.get('campos')) is None else json.dumps(e.get('item', e.get('campos')), ensure_ascii=False))
+                        for e in movimentos])
+                    self._gravar_estoque(conexao, estado)
+            except BaseException:
+                conexao.close(); os.remove(temporario); raise
+            conexao.close(); os.replace(temporario, self.caminho)
+        estado.seq_movimentos = max([estado.seq_movimentos] + [e['seq'] for e in movimentos])
+
+def obter_armazenamento():
+    if ARMAZENAMENTO == 'csv': return ArmazenamentoCSV()
+    return ArmazenamentoSQLite()
+
+def salvar_cadastros(estado):
+    with medidor.etapa("persistência: cadastros"): estado.armazenamento.salvar_cadastros(estado)
+
+def salvar_dados(estado):
+    with estado.lock, medidor.etapa("persistência: gravar tudo"): estado.armazenamento.salvar_tudo(estado)
+
+def registrar_movimentos(estado, eventos):
+    # Deve ser chamada com estado.lock já adquirido, antes de trocar o DataFrame.
+    if not eventos: return
+    agora = datetime.now().isoformat(timespec='seconds')
+    eventos = [{'seq': estado.seq_movimentos + n, 'ts': agora, **evento} for n, evento in enumerate(eventos, start=1)]
+    with medidor.etapa("persistência: movimentos"): estado.armazenamento.gravar_movimentos(estado, eventos)
+    estado.seq_movimentos = eventos[-1]['seq']; estado.analise.registrar(eventos)
+
+def _concluir_alteracao(estado, celulas=None, excluidos=()):
+    # `celulas` mapeia ID -> colunas alteradas ('*' para item novo); usado na checagem de concorrência do editor.
+    estado.versao += 1
+    for item_id, colunas in (celulas or {}).items():
+        versoes = estado.versao_celulas.setdefault(item_id, {})
+        for coluna in colunas: versoes[coluna] = estado.versao
+    for item_id in excluidos: estado.versao_celulas.pop(item_id, None)
+    if excluidos: estado.versao_estrutura = estado.versao
+    for ouvinte in estado.ouvintes: ouvinte(estado, list(celulas or {}), list(excluidos))
+    # Contador próprio: `versao` também sobe em alterações que não mexem nos valores (colunas, cadastros).
+    estado.alteracoes_desde_ressincronia += 1
+    if estado.alteracoes_desde_ressincronia >= RESSINCRONIZAR_VALOR_A_CADA:
+        estado.valor_total = sum(estado.valor_por_id.values()); estado.alteracoes_desde_ressincronia = 0  # descarta o erro acumulado de ponto flutuante
+    with medidor.etapa("persistência: manutenção"): estado.armazenamento.manutencao(estado)
+
+def carregar_dados(estado):
+    armazenamento = estado.armazenamento; legado = ArmazenamentoCSV()
+    if armazenamento.existe():
+        with medidor.etapa("persistência: carregar"): armazenamento.carregar(estado)
+    elif isinstance(armazenamento, ArmazenamentoSQLite) and legado.existe(): armazenamento.migrar_de(legado, estado)
+    else:
+        estado.categorias = ["Agulhas", "Tintas", "Descartáveis", "Higiene"]
+        estado.fornecedores = ["Art Prime", "Tattoo Loja", "Fornecedor Local"]
+        estado.colunas_visiveis = list(COLUNAS_PADRAO)
+        iniciais = [
+            ("Cartucho", "Cheyenne", "7RL", "Agulhas", "Art Prime", 25, 30, "Unidade", 3.00),
+            ("Tinta Preta", "Dynamic", "Triple Black", "Tintas", "Tattoo Loja", 240, 100, "ml", 0.37),
+            ("Luva Nitrílica", "Talge", "M", "Descartáveis", "Fornecedor Local", 40, 50, "Par", 0.80),
+        ]
+        registros = [{"ID": n, "Nome do Item": nome, "Marca/Modelo": marca, "Tipo/Especificação": especificacao, "Categoria": categoria, "Fornecedor Principal": fornecedor, "Quantidade em Estoque": float(quantidade), "Estoque Mínimo": int(estoque_minimo), "Unidade de Medida": unidade, "Preço de Custo": float(preco_custo), "Data da Última Compra": date.today().strftime("%Y-%m-%d"), "Observações": ""}
+                     for n, (nome, marca, especificacao, categoria, fornecedor, quantidade, estoque_minimo, unidade, preco_custo) in enumerate(iniciais, start=1)]
+        estado.estoque_df = _tipar(pd.DataFrame(registros), estado.categorias, estado.fornecedores)
+        salvar_dados(estado)
+    reconstruir_indices(estado); estado.analise = AnaliseConsumo(*armazenamento.ler_consumo(inicio_das_janelas()))
+
+# --- FUNÇÕES DE LÓGICA ---
+def adicionar_item(estado, nome, marca, especificacao, categoria, fornecedor, quantidade, estoque_minimo, unidade, preco_custo, observacoes=""):
+    with estado.lock:
+        df = estado.estoque_df; novo_id = 1 if df.empty else int(df["ID"].max()) + 1
+        registro = {"ID": novo_id, "Nome do Item": nome, "Marca/Modelo": marca, "Tipo/Especificação": especificacao, "Categoria": categoria, "Fornecedor Principal": fornecedor, "Quantidade em Estoque": float(quantidade), "Estoque Mínimo": int(estoque_minimo), "Unidade de Medida": unidade, "Preço de Custo": float(preco_custo), "Data da Última Compra": date.today().strftime("%Y-%m-%d"), "Observações": observacoes}
+        registrar_movimentos(estado, [{'op': 'entrada', 'item': registro}])
+        df = _garantir_categorias(df, registro); novo_item = pd.DataFrame([registro]).astype(df.dtypes.to_dict())
+        estado.estoque_df = pd.concat([df, novo_item], ignore_index=True); estado.posicao_por_id[novo_id] = len(df)
+        _indexar_itens(estado, novo_item); _concluir_alteracao(estado, {novo_id: ['*']})
+
+def registrar_uso_em_lote(estado, itens):
+    # Aplica a sessão inteira de uma vez: soma IDs repetidos, valida tudo e só então grava.
+    if not itens: return
+    consumo = pd.DataFrame(itens, columns=['id', 'qtd']).astype({'id': int, 'qtd': float}).groupby('id')['qtd'].sum()
+    with estado.lock:
+        ausentes = [i for i in consumo.index if i not in estado.posicao_por_id]
+        if ausentes:
+            raise ValueError(f"Itens não encontrados no estoque: {', '.join(str(i) for i in ausentes)}")
+        registrar_movimentos(estado, [{'op': 'consumo', 'id': int(i), 'qtd': float(q)} for i, q in consumo.items()])
+        posicoes = [estado.posicao_por_id[i] for i in consumo.index]; df = estado.estoque_df.copy(deep=False)
+        quantidades = df['Quantidade em Estoque'].to_numpy(dtype=float, copy=True); quantidades[posicoes] -= consumo.to_numpy()
+        df['Quantidade em Estoque'] = quantidades; estado.estoque_df = df
+        _indexar_itens(estado, df.iloc[posicoes], textos=False); _concluir_alteracao(estado, {i: ['Quantidade em Estoque'] for i in consumo.index})
+
+def registrar_uso(estado, item_id, quantidade_usada):
+    registrar_uso_em_lote(estado, [{'id': item_id, 'qtd': quantidade_usada}])
+
+def eventos_do_editor(ids_vista, linhas_editadas):
+    # Traduz o delta do st.data_editor ({posição: {coluna: valor}}) em eventos por ID, sem comparar a tabela inteira.
+    eventos = []; excluidos = []
+    for posicao, campos in linhas_editadas.items():
+        if not 0 <= int(posicao) < len(ids_vista):
+            raise ValueError("A tabela mudou enquanto você editava (linha fora da versão aberta). Recarregue a página e refaça as alterações.")
+        item_id = int(ids_vista[int(posicao)]); campos = dict(campos)
+        if campos.pop("Excluir", False): excluidos.append(item_id); continue
+        campos = {c: v for c, v in campos.items() if c in TIPOS_COLUNAS and c != "ID"}
+        if campos: eventos.append({'op': 'edicao', 'id': item_id, 'campos': campos})
+    return eventos + [{'op': 'exclusao', 'id': i} for i in excluidos]
+
+def _validar_campos(estado, item_id, campos):
+    normalizados = {}; erros = []
+    for coluna, valor in campos.items():
+        if valor is None or (isinstance(valor, str) and not valor.strip()):
+            if coluna in CAMPOS_OBRIGATORIOS: erros.append(f"ID {item_id}: '{coluna}' é obrigatório")
+            else: normalizados[coluna] = None
+            continue
+        tipo = TIPOS_COLUNAS[coluna]
+        try: valor = int(valor) if tipo == "int64" else float(valor) if tipo == "float64" else str(valor)
+        except (TypeError, ValueError): erros.append(f"ID {item_id}: valor inválido para '{coluna}'"); continue
+        if coluna == "Categoria" and valor not in estado.categorias: erros.append(f"ID {item_id}: categoria '{valor}' não cadastrada")
+        elif coluna == "Fornecedor Principal" and valor not in estado.fornecedores: erros.append(f"ID {item_id}: fornecedor '{valor}' não cadastrado")
+        elif coluna in ("Quantidade em Estoque", "Estoque Mínimo", "Preço de Custo") and valor < 0: erros.append(f"ID {item_id}: '{coluna}' não pode ser negativo")
+        else: normalizados[coluna] = valor
+    return normalizados, erros
+
+def _alterado_desde(estado, item_id, colunas, versao_base):
+    versoes = estado.versao_celulas.get(item_id, {})
+    return max([versoes.get(c, 0) for c in colunas] + [versoes.get('*', 0)]) > versao_base
+
+def aplicar_edicoes(estado, eventos, versao_base=None, estrutura_base=None):
+    # Aplica só as células e exclusões do delta, com controle de concorrência otimista: a gravação
+    # inteira é recusada se houve exclusões desde `estrutura_base` ou se alguma das mesmas células
+    # foi alterada em outra sessão depois de `versao_base`.
+    if not eventos: return
+    with estado.lock:
+        if estrutura_base is not None and estrutura_base != estado.versao_estrutura:
+            raise ValueError("Itens foram excluídos em outra sessão desde que a tabela foi aberta. Recarregue a página e refaça as alterações.")
+        edicoes = [e for e in eventos if e['op'] == 'edicao']
+        exclusoes = [e for e in eventos if e['op'] == 'exclusao' and e['id'] in estado.posicao_por_id]
+        ausentes = [e['id'] for e in edicoes if e['id'] not in estado.posicao_por_id]
+        if ausentes: raise ValueError(f"Itens não encontrados no estoque: {', '.join(str(i) for i in ausentes)}")
+        if versao_base is not None:
+            conflitos = [e['id'] for e in edicoes if _alterado_desde(estado, e['id'], e['campos'], versao_base)]
+            if conflitos: raise ValueError(f"Itens alterados em outra sessão enquanto você editava: {', '.join(str(i) for i in conflitos)}. Recarregue a página e refaça as alterações.")
+        erros = []
+        for evento in edicoes:
+            evento['campos'], erros_item = _validar_campos(estado, evento['id'], evento['campos']); erros += erros_item
+        if erros: raise ValueError("; ".join(erros))
+        edicoes = [e for e in edicoes if e['campos']]
+        if not edicoes and not exclusoes: return
+        registrar_movimentos(estado, edicoes + exclusoes)
+        df = estado.estoque_df.copy(deep=False); por_coluna = {}
+        for evento in edicoes:
+            df = _garantir_categorias(df, evento['campos'])
+            for coluna, valor in evento['campos'].items():
+                posicoes, valores = por_coluna.setdefault(coluna, ([], []))
+                posicoes.append(estado.posicao_por_id[evento['id']]); valores.append(valor)
+        for coluna, (posicoes, valores) in por_coluna.items():
+            serie = df[coluna].copy(); serie.iloc[posicoes] = valores; df[coluna] = serie
+        excluidos = [e['id'] for e in exclusoes]
+        if excluidos:
+            df = df.drop(index=df.index[[estado.posicao_por_id[i] for i in excluidos]]).reset_index(drop=True)
+        estado.estoque_df = df
+        if excluidos: _desindexar_itens(estado, excluidos); _reposicionar(estado)
+        editados = {e['id'] for e in edicoes} - set(excluidos)
+        if editados: _indexar_itens(estado, df.iloc[[estado.posicao_por_id[i] for i in editados]])
+        _concluir_alteracao(estado, {e['id']: list(e['campos']) for e in edicoes}, excluidos)
+
+def definir_colunas_visiveis(estado, colunas):
+    with estado.lock: estado.colunas_visiveis = list(colunas); salvar_cadastros(estado); estado.versao += 1
+
+def alterar_cadastro(estado, tipo, valor, remover=False):
+    # tipo é 'categorias' ou 'fornecedores'; a lista é trocada, não alterada, pelo mesmo motivo do DataFrame.
+    with estado.lock:
+        atual = getattr(estado, tipo)
+        if remover: novo = [v for v in atual if v != valor]
+        elif valor in atual: return False
+        else: novo = atual + [valor]
+        setattr(estado, tipo, novo); salvar_cadastros(estado); estado.versao += 1
+    return True
+
+def prever_compras(estado, com_chave=False):
+    # Só a leitura da versão e do DataFrame fica sob o lock; o cálculo roda fora dele, sem travar as escritas.
+    with estado.lock: versao, df = estado.versao, estado.estoque_df
+    with medidor.etapa("previsão de compras"): chave, previsao = estado.analise.previsao_com_chave(df, versao)
+    return (chave, previsao) if com_chave else previsao
+
+def gerar_lista_de_compras(estado, previsao=None):
+    # Itens no ponto de pedido (estoque mínimo + consumo durante o prazo de entrega), mais os do
+    # mesmo fornecedor que chegariam lá dentro da cobertura, agrupados por fornecedor.
+    previsao = prever_compras(estado) if previsao is None else previsao
+    lista = previsao[previsao['Comprar Agora']]
+    if lista.empty: return None
+    lista = lista.sort_values(['Fornecedor Principal', 'Dias até Acabar', 'Nome do Item'], na_position='last')
+    return lista[['Nome do Item', 'Marca/Modelo', 'Fornecedor Principal', 'Quantidade em Estoque', 'Estoque Mínimo', 'Consumo Diário', 'Dias até Acabar', 'Quantidade a Comprar']].round({'Consumo Diário': 2, 'Dias até Acabar': 0})
+
+def gerar_pdf_relatorio(dataframe, titulo):
+    pdf = FPDF(orientation='L', unit='mm', format='A4'); pdf.set_auto_page_break(False); pdf.add_page()
+    pdf.set_font("Helvetica", "B", 16); pdf.cell(0, 10, titulo, align="C", new_x=XPos.LMARGIN, new_y=YPos.NEXT); pdf.ln(5)
+    pdf.set_font("Helvetica", "", 10); pdf.cell(0, 10, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}", align="R", new_x=XPos.LMARGIN, new_y=YPos.NEXT); pdf.ln(5)
+    cabecalhos = [str(c) for c in dataframe.columns]; altura = 8
+    col_width = (pdf.w - 2 * pdf.l_margin) / len(cabecalhos) if cabecalhos else 0
+    def desenhar_cabecalho():
+        pdf.set_font("Helvetica", "B", 8); pdf.set_fill_color(46, 46, 84); pdf.set_text_color(255, 255, 255)
+        for header in cabecalhos: pdf.cell(col_width, altura, header, border=1, align="C", fill=True)
+        pdf.ln(); pdf.set_font("Helvetica", "", 8); pdf.set_fill_color(232, 232, 240); pdf.set_text_color(0, 0, 0)
+    desenhar_cabecalho()
+    # Converte cada coluna para texto de uma vez e percorre as linhas como tuplas, sem montar uma Series por linha.
+    colunas_texto = [dataframe[c].astype(object).fillna('').astype(str).tolist() for c in dataframe.columns]
+    limite = pdf.h - pdf.b_margin; fill = False
+    for linha in zip(*colunas_texto):
+        if pdf.get_y() + altura > limite: pdf.add_page(); desenhar_cabecalho()
+        for item in linha: pdf.cell(col_width, altura, item, border=1, align="C", fill=fill)
+        fill = not fill; pdf.ln()
+    return bytes(pdf.output())
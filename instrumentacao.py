@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# --- INSTRUMENTAÇÃO DE DESEMPENHO ---
+# Cronômetros leves por etapa de um rerun (CSS, sidebar, página, persistência...). O rerun em
+# andamento fica num threading.local, porque cada sessão do Streamlit roda o script na sua própria
+# thread; `etapa()` fora de um rerun (worker em segundo plano, benchmarks, scripts) não mede nada.
+# Reruns concluídos vão para um buffer circular em memória, compartilhado pelo processo, que
+# alimenta a página oculta de desempenho (?admin=desempenho) e a exportação em JSON.
+# Etapas podem ser aninhadas (ex.: "css" dentro de "sidebar"); cada uma soma o próprio tempo.
+# Trabalho que o Streamlit executa fora do rerun (o PDF do download_button roda numa thread do
+# asyncio) é medido com `avulso()` e entra no buffer como um registro próprio, marcado 'avulso'.
+CAPACIDADE = 1000
+
+class Instrumentacao:
+    def __init__(self, capacidade=CAPACIDADE):
+        self.reruns = deque(maxlen=capacidade); self.lock = threading.Lock(); self.local = threading.local()
+
+    def iniciar_rerun(self):
+        self.local.atual = {'inicio': datetime.now().isoformat(timespec='milliseconds'), 'etapas': {}}
+        self.local.t0 = time.perf_counter()
+
+    @contextmanager
+    def etapa(self, nome):
+        atual = getattr(self.local, 'atual', None)
+        if atual is None:
+            yield; return
+        inicio = time.perf_counter()
+        try: yield
+        finally: atual['etapas'][nome] = atual['etapas'].get(nome, 0.0) + (time.perf_counter() - inicio) * 1000
+
+    @contextmanager
+    def avulso(self, pagina, nome):
+        registro = {'inicio': datetime.now().isoformat(timespec='milliseconds'), 'pagina': pagina, 'avulso': True}
+        inicio = time.perf_counter()
+        try: yield
+        finally:
+            registro['total_ms'] = (time.perf_counter() - inicio) * 1000; registro['etapas'] = {nome: registro['total_ms']}
+            with self.lock: self.reruns.append(registro)
+
+    def finalizar_rerun(self, pagina):
+        atual = getattr(self.local, 'atual', None)
+        if atual is None: return
+        atual['pagina'] = pagina; atual['total_ms'] = (time.perf_counter() - self.local.t0) * 1000; self.local.atual = None
+        with self.lock: self.reruns.append(atual)
+
+    def registros(self):
+        with self.lock: return list(self.reruns)
+
+    def limpar(self):
+        with self.lock: self.reruns.clear()
+
+    @staticmethod
+    def _percentis(medidas, chaves):
+        colunas = ['Reruns', 'p50 (ms)', 'p95 (ms)', 'Máx (ms)']
+        if medidas.empty: return pd.DataFrame(columns=chaves + colunas)
+        grupos = medidas.groupby(chaves, sort=False)['ms']
+        tabela = pd.DataFrame({'Reruns': grupos.size(), 'p50 (ms)': grupos.quantile(0.5), 'p95 (ms)': grupos.quantile(0.95), 'Máx (ms)': grupos.max()})
+        return tabela.reset_index().sort_values('p95 (ms)', ascending=False).round(2)
+
+    def por_pagina(self, registros=None):
+        registros = self.registros() if registros is None else registros
+        return self._percentis(pd.DataFrame([(r['pagina'], r['total_ms']) for r in registros], columns=['Página', 'ms']), ['Página'])
+
+    def por_etapa(self, registros=None, pagina=None):
+        registros = self.registros() if registros is None else registros
+        medidas = pd.DataFrame([(etapa, ms) for r in registros if pagina in (None, r['pagina']) for etapa, ms in r['etapas'].items()], columns=['Etapa', 'ms'])
+        return self._percentis(medidas, ['Etapa'])
+
+    def recentes(self, registros=None, limite=50):
+        registros = (self.registros() if registros is None else registros)[-limite:]
+        return pd.DataFrame([{'Início': r['inicio'], 'Página': r['pagina'], 'Total (ms)': round(r['total_ms'], 2), **{e: round(ms, 2) for e, ms in r['etapas'].items()}} for r in reversed(registros)])
+
+    def exportar_json(self):
+        registros = self.registros()
+        return json.dumps({'gerado_em': datetime.now().isoformat(timespec='seconds'), 'capacidade': self.reruns.maxlen, 'reruns': registros,
+                           'por_pagina': self.por_pagina(registros).to_dict('records'), 'por_etapa': self.por_etapa(registros).to_dict('records')},
+                          ensure_ascii=False, indent=2)
+
+# Uma instância por processo: o módulo fica em sys.modules entre reruns, como o cache_resource.
+medidor = Instrumentacao()
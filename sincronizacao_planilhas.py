@@ -0,0 +1,192 @@
+import heapq
+import queue
+import random
+import threading
+from datetime import datetime
+
+# --- SINCRONIZAÇÃO COM GOOGLE SHEETS ---
+# Espelha o estoque numa planilha sem nunca bloquear o Streamlit: as alterações entram numa fila
+# limitada (put_nowait), uma thread em segundo plano junta tudo o que chegou dentro de uma janela
+# (a última versão de cada ID vence), agrupa linhas vizinhas em ranges e envia um único
+# batch_update, com novas tentativas e backoff exponencial em caso de erro.
+# Se a fila enche, as alterações não se perdem: o worker faz uma ressincronização completa.
+# Layout da planilha: linha 1 é o cabeçalho, coluna A é o ID, uma linha por item.
+# A linha de um item excluído é limpa e reaproveitada pelo próximo item novo (a de menor número
+# primeiro); a ressincronização completa reescreve a planilha sem buracos.
+
+def _letra_coluna(numero):
+    letras = ""
+    while numero: numero, resto = divmod(numero - 1, 26); letras = chr(65 + resto) + letras
+    return letras
+
+def _celula(valor):
+    if valor is None: return ""
+    if hasattr(valor, 'item'): valor = valor.item()
+    if isinstance(valor, float) and valor != valor: return ""  # NaN
+    return valor if isinstance(valor, (int, float, str)) else str(valor)
+
+def abrir_planilha(nome, credenciais):
+    # Import tardio: gspread/oauth2client só são necessários quando a sincronização está ligada.
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    escopo = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    cliente = gspread.authorize(ServiceAccountCredentials.from_json_keyfile_name(credenciais, escopo))
+    return cliente.open(nome).sheet1
+
+class PlanilhaFalsa:
+    # Implementa o subconjunto da API de gspread.Worksheet usado aqui, em memória, para testes locais.
+    # `falhas` faz as próximas N chamadas levantarem erro, para exercitar as novas tentativas.
+    def __init__(self, falhas=0):
+        self.celulas = {}; self.falhas = falhas; self.chamadas = 0; self.lock = threading.Lock()
+
+    def _talvez_falhar(self):
+        self.chamadas += 1
+        if self.falhas > 0: self.falhas -= 1; raise ConnectionError("falha simulada da API do Sheets")
+
+    @staticmethod
+    def _intervalo(rng):
+        inicio, _, fim = rng.partition(':'); fim = fim or inicio
+        def separar(ref):
+            letras = ''.join(c for c in ref if c.isalpha()); numero = int(''.join(c for c in ref if c.isdigit()))
+            coluna = 0
+            for c in letras: coluna = coluna * 26 + ord(c.upper()) - 64
+            return numero, coluna
+        return separar(inicio), separar(fim)
+
+    def col_values(self, coluna):
+        with self.lock:
+            self._talvez_falhar()
+            ultima = max((l for l, c in self.celulas if c == coluna), default=0)
+            return [self.celulas.get((l, coluna), "") for l in range(1, ultima + 1)]
+
+    def batch_update(self, dados, **kwargs):
+        with self.lock:
+            self._talvez_falhar()
+            for bloco in dados:
+                (linha, coluna), _ = self._intervalo(bloco['range'])
+                for i, valores in enumerate(bloco['values']):
+                    for j, valor in enumerate(valores): self.celulas[(linha + i, coluna + j)] = valor
+
+    def batch_clear(self, intervalos):
+        with self.lock:
+            self._talvez_falhar()
+            for rng in intervalos:
+                (l1, c1), (l2, c2) = self._intervalo(rng)
+                for chave in [k for k in self.celulas if l1 <= k[0] <= l2 and c1 <= k[1] <= c2]: del self.celulas[chave]
+
+    def clear(self):
+        with self.lock: self._talvez_falhar(); self.celulas.clear()
+
+    def linhas(self):
+        with self.lock:
+            if not self.celulas: return []
+            ultima_linha = max(l for l, _ in self.celulas); ultima_coluna = max(c for _, c in self.celulas)
+            return [[self.celulas.get((l, c), "") for c in range(1, ultima_coluna + 1)] for l in range(1, ultima_linha + 1)]
+
+class SincronizadorPlanilhas:
+    def __init__(self, abrir, colunas, obter_linhas, tamanho_fila=1000, janela=2.0, tentativas=5, espera_inicial=1.0):
+        # `abrir` devolve o worksheet (chamado na thread do worker, nunca num rerun);
+        # `obter_linhas` devolve todas as linhas atuais, usado na ressincronização completa.
+        self.abrir = abrir; self.colunas = list(colunas); self.obter_linhas = obter_linhas
+        self.janela = janela; self.tentativas = tentativas; self.espera_inicial = espera_inicial
+        self.fila = queue.Queue(maxsize=tamanho_fila); self.precisa_ressincronizar = threading.Event()
+        self.planilha = None; self.linha_por_id = None; self.linhas_livres = []; self.parar = threading.Event()
+        self.ultimo_envio = None; self.ultimo_erro = None; self.enviados = 0
+        self.thread = threading.Thread(target=self._executar, name="sincronizacao-planilhas", daemon=True)
+        self.thread.start()
+
+    def enfileirar(self, linhas, excluidos=()):
+        # Chamado dentro das alterações do estoque: nunca bloqueia nem faz I/O.
+        try: self.fila.put_nowait(({int(linha[0]): linha for linha in linhas}, list(excluidos)))
+        except queue.Full: self.precisa_ressincronizar.set()
+
+    def ressincronizar(self):
+        self.precisa_ressincronizar.set()
+        try: self.fila.put_nowait(({}, []))  # acorda o worker
+        except queue.Full: pass
+
+    def status(self):
+        return {'pendentes': self.fila.qsize(), 'ultimo_envio': self.ultimo_envio, 'ultimo_erro': self.ultimo_erro, 'linhas_enviadas': self.enviados}
+
+    def encerrar(self, timeout=5.0):
+        self.parar.set()
+        try: self.fila.put_nowait(({}, []))
+        except queue.Full: pass
+        self.thread.join(timeout)
+
+    def _executar(self):
+        pendentes = {}
+        while not self.parar.is_set():
+            try: lote = self.fila.get(timeout=1.0)
+            except queue.Empty:
+                if not pendentes and not self.precisa_ressincronizar.is_set(): continue
+            else:
+                self.parar.wait(self.janela)  # janela de coalescência: junta o que chegar nesse intervalo
+                self._acumular(pendentes, lote)
+                while True:
+                    try: self._acumular(pendentes, self.fila.get_nowait())
+                    except queue.Empty: break
+            completa = self.precisa_ressincronizar.is_set()
+            try:
+                if completa: self.precisa_ressincronizar.clear(); self._com_tentativas(self._enviar_tudo)
+                elif pendentes: self._com_tentativas(self._enviar, pendentes)
+                pendentes.clear()
+            except Exception as erro:
+                # Esgotou as tentativas: mantém `pendentes` (ou a ressincronização) para o próximo ciclo.
+                if completa: self.precisa_ressincronizar.set()
+                self.ultimo_erro = f"{datetime.now():%d/%m %H:%M:%S} {erro}"; self.linha_por_id = None
+                self.parar.wait(self.espera_inicial * 2 ** self.tentativas)
+
+    @staticmethod
+    def _acumular(pendentes, lote):
+        linhas, excluidos = lote
+        pendentes.update(linhas)
+        for item_id in excluidos: pendentes[int(item_id)] = None
+
+    def _com_tentativas(self, funcao, *args):
+        for tentativa in range(self.tentativas):
+            try:
+                if self.planilha is None: self.planilha = self.abrir()
+                funcao(*args); self.ultimo_envio = datetime.now(); self.ultimo_erro = None; return
+            except Exception as erro:
+                if tentativa == self.tentativas - 1: raise
+                self.ultimo_erro = str(erro); self.linha_por_id = None
+                self.parar.wait(self.espera_inicial * 2 ** tentativa * (1 + random.random() / 2))
+
+    def _carregar_mapa(self):
+        ids = self.planilha.col_values(1)[1:]
+        self.linha_por_id = {int(v): n for n, v in enumerate(ids, start=2) if str(v).strip().lstrip('-').isdigit()}
+        self.linhas_livres = [n for n, v in enumerate(ids, start=2) if not str(v).strip()]; heapq.heapify(self.linhas_livres)
+
+    def _enviar(self, pendentes):
+        if self.linha_por_id is None: self._carregar_mapa()
+        ultima_coluna = _letra_coluna(len(self.colunas)); proxima = max([*self.linha_por_id.values(), *self.linhas_livres], default=1) + 1
+        novas_linhas = {}; limpar = []
+        for item_id, valores in pendentes.items():
+            if valores is None:
+                if item_id in self.linha_por_id: limpar.append(self.linha_por_id[item_id])
+                continue
+            if item_id not in self.linha_por_id:
+                if self.linhas_livres: self.linha_por_id[item_id] = heapq.heappop(self.linhas_livres)
+                else: self.linha_por_id[item_id] = proxima; proxima += 1
+            novas_linhas[self.linha_por_id[item_id]] = [_celula(v) for v in valores]
+        # Linhas consecutivas viram um único range, então N alterações vizinhas custam um bloco só.
+        blocos = []
+        for linha in sorted(novas_linhas):
+            if blocos and blocos[-1][0] + len(blocos[-1][1]) == linha: blocos[-1][1].append(novas_linhas[linha])
+            else: blocos.append((linha, [novas_linhas[linha]]))
+        if blocos:
+            self.planilha.batch_update([{'range': f"A{inicio}:{ultima_coluna}{inicio + len(valores) - 1}", 'values': valores} for inicio, valores in blocos], value_input_option='RAW')
+        if limpar:
+            self.planilha.batch_clear([f"A{linha}:{ultima_coluna}{linha}" for linha in sorted(limpar)])
+            # Só ficam livres depois de limpas: um item novo deste mesmo lote não pode cair numa linha que seria apagada.
+            self.linha_por_id = {i: l for i, l in self.linha_por_id.items() if l not in set(limpar)}
+            for linha in limpar: heapq.heappush(self.linhas_livres, linha)
+        self.enviados += len(novas_linhas) + len(limpar)
+
+    def _enviar_tudo(self):
+        linhas = [[_celula(v) for v in linha] for linha in self.obter_linhas()]
+        self.planilha.clear()
+        self.planilha.batch_update([{'range': f"A1:{_letra_coluna(len(self.colunas))}{len(linhas) + 1}", 'values': [self.colunas] + linhas}], value_input_option='RAW')
+        self.linha_por_id = {int(linha[0]): n for n, linha in enumerate(linhas, start=2)}; self.linhas_livres = []
+        self.enviados += len(linhas)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import estoque_core as core
+
+@pytest.fixture(autouse=True)
+def pasta_temporaria(tmp_path, monkeypatch):
+    # Os arquivos do estoque usam caminhos relativos: cada teste roda numa pasta vazia própria.
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def abrir(armazenamento=None):
+    return core.abrir_estoque(armazenamento or core.ArmazenamentoSQLite(), sincronizar=False)
+
+def quantidade(estado, item_id):
+    df = estado.estoque_df
+    return float(df.loc[df['ID'] == item_id, 'Quantidade em Estoque'].iloc[0])
@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import estoque_core as core
+from analise_consumo import AnaliseConsumo, inicio_das_janelas
+from conftest import abrir
+
+def _ts(dias):
+    return (datetime.now() - timedelta(days=dias)).isoformat(timespec='seconds')
+
+@pytest.mark.parametrize("armazenamento", [core.ArmazenamentoSQLite, core.ArmazenamentoCSV])
+def test_carga_filtrada_da_as_mesmas_taxas_que_o_historico_completo(armazenamento):
+    estado = abrir(armazenamento())
+    movimentos = [
+        {'op': 'consumo', 'id': 1, 'qtd': 5.0, 'ts': _ts(120)}, {'op': 'consumo', 'id': 1, 'qtd': 3.0, 'ts': _ts(10)},
+        {'op': 'consumo', 'id': 2, 'qtd': 4.0, 'ts': _ts(100)}, {'op': 'exclusao', 'id': 2, 'ts': _ts(95)},
+        {'op': 'consumo', 'id': 2, 'qtd': 2.0, 'ts': _ts(5)}, {'op': 'consumo', 'id': 3, 'qtd': 1.0, 'ts': _ts(100)},
+        {'op': 'edicao', 'id': 3, 'campos': {'Observações': 'fora da análise'}, 'ts': _ts(2)},
+    ]
+    eventos = [{'seq': estado.seq_movimentos + n, **evento} for n, evento in enumerate(movimentos, start=1)]
+    estado.armazenamento.gravar_movimentos(estado, eventos)
+
+    recentes, anteriores = estado.armazenamento.ler_consumo(inicio_das_janelas())
+    assert [e['seq'] for e in recentes] == [eventos[1]['seq'], eventos[4]['seq']]
+    # O item 2 foi excluído depois do uso antigo: o histórico dele recomeça dentro da janela.
+    assert set(anteriores) == {1, 3}
+
+    completo = AnaliseConsumo(estado.armazenamento.ler_movimentos()).obter_taxas().sort_index()
+    pd.testing.assert_frame_equal(AnaliseConsumo(recentes, anteriores).obter_taxas().sort_index(), completo)
+    pd.testing.assert_frame_equal(abrir(armazenamento()).analise.obter_taxas().sort_index(), completo)
@@ -0,0 +1,48 @@
+import pandas as pd
+
+from estoque_core import IndiceBusca
+
+def _indice(*itens):
+    indice = IndiceBusca(); indice.atualizar(_linhas(*itens))
+    return indice
+
+def _linhas(*itens):
+    return pd.DataFrame(itens, columns=['ID'] + IndiceBusca.CAMPOS)
+
+ITENS = [
+    (1, "Cartucho", "Cheyenne", "7RL", "Agulhas"), (2, "Tinta Preta", "Dynamic", "Triple Black", "Tintas"),
+    (3, "Tintas Coloridas", "Electric Ink", "Kit 12", "Tintas"), (4, "Luva Nitrílica", "Talge", "M", "Descartáveis"),
+    (5, "Sabonete", "Riohex", "1L", "Higiene"),
+]
+
+def test_busca_por_prefixo_poe_o_token_exato_na_frente():
+    indice = _indice(*ITENS)
+    assert indice.buscar("tinta") == [2, 3]
+    assert indice.buscar("tin") == [2, 3] and indice.buscar("car") == [1]
+    # Itens que casam mais termos vêm primeiro; os que casam só parte continuam na lista, depois.
+    assert indice.buscar("tinta preta") == [2, 3]
+
+def test_busca_ignora_acentos_e_maiusculas():
+    indice = _indice(*ITENS)
+    assert indice.buscar("NITRILICA") == [4] and indice.buscar("descartaveis") == [4]
+    assert indice.buscar("higiêne") == [5]
+
+def test_busca_aproximada_quando_nenhum_prefixo_casa():
+    indice = _indice(*ITENS)
+    assert indice.buscar("cartuxo") == [1] and indice.buscar("sabonte") == [5]
+    assert indice.buscar("xyzw") == []
+
+def test_edicao_e_exclusao_tiram_os_tokens_antigos():
+    indice = _indice(*ITENS)
+    indice.atualizar(_linhas((1, "Biqueira", "Cheyenne", "Inox", "Biqueiras")))
+    assert 'cartucho' not in indice.vocabulario and 'cartucho' not in indice.ids_por_token and 'agulhas' not in indice.vocabulario
+    assert indice.buscar("cartucho") == [] and indice.buscar("biqueira") == [1] and indice.ids_por_token['cheyenne'] == {1}
+    indice.remover([4])
+    assert not {'luva', 'nitrilica', 'talge', 'descartaveis'} & (set(indice.vocabulario) | set(indice.ids_por_token))
+    assert indice.vocabulario == sorted(indice.ids_por_token) and indice.buscar("luva") == []
+
+def test_lista_padrao_fica_em_ordem_de_id_apos_edicao():
+    indice = _indice(*ITENS)
+    indice.atualizar(_linhas((2, "Tinta Preta 2", "Dynamic", "Triple Black", "Tintas"))); indice.remover([3])
+    indice.atualizar(_linhas((6, "Filme PVC", "Plastifilm", "Rolo", "Descartáveis")))
+    assert indice.primeiros() == [1, 2, 4, 5, 6] and indice.primeiros(2) == [1, 2]
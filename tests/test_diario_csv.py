@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+import estoque_core as core
+from conftest import abrir, quantidade
+
+def abrir_csv():
+    return abrir(core.ArmazenamentoCSV())
+
+def test_diario_reaplicado_ao_recarregar():
+    estado = abrir_csv(); core.registrar_uso(estado, 1, 5); core.registrar_uso_em_lote(estado, [{'id': 2, 'qtd': 10}, {'id': 1, 'qtd': 1}])
+    recarregado = abrir_csv()
+    assert quantidade(recarregado, 1) == 19.0 and quantidade(recarregado, 2) == 230.0
+    assert recarregado.seq_movimentos == estado.seq_movimentos
+
+def test_linha_cortada_nao_engole_eventos_seguintes():
+    estado = abrir_csv(); core.registrar_uso(estado, 1, 1)
+    with open(core.DIARIO_FILE, 'a', encoding='utf-8') as f: f.write('{"seq": 99, "ts": "2026')
+    estado = abrir_csv(); assert quantidade(estado, 1) == 24.0
+    core.registrar_uso(estado, 1, 5)
+    assert quantidade(abrir_csv(), 1) == 19.0
+    with open(core.DIARIO_FILE, 'r', encoding='utf-8') as f: assert all(json.loads(linha) for linha in f)
+
+def test_queda_entre_snapshot_e_cadastros_nao_reaplica_consumo(monkeypatch):
+    estado = abrir_csv(); core.registrar_uso(estado, 1, 5)
+    def falhar(self, estado): raise OSError("queda simulada")
+    with monkeypatch.context() as m:
+        m.setattr(core.ArmazenamentoCSV, 'salvar_cadastros', falhar)
+        with pytest.raises(OSError): core.salvar_dados(estado)
+    assert quantidade(abrir_csv(), 1) == 20.0
+
+def test_compactacao_arquiva_sem_duplicar_historico():
+    estado = abrir_csv()
+    for _ in range(core.COMPACTAR_A_CADA + 3): core.registrar_uso(estado, 2, 1)
+    recarregado = abrir_csv()
+    assert quantidade(recarregado, 2) == 240.0 - core.COMPACTAR_A_CADA - 3
+    seqs = [e['seq'] for e in recarregado.armazenamento.ler_movimentos()]
+    assert len(seqs) == len(set(seqs)) == core.COMPACTAR_A_CADA + 3
+
+def test_snapshot_legado_usa_seq_do_cadastros():
+    abrir_csv()
+    with open(core.ESTOQUE_FILE, 'r', encoding='utf-8') as f: linhas = f.readlines()
+    with open(core.ESTOQUE_FILE, 'w', encoding='utf-8') as f: f.writelines(linhas[1:])
+    with open(core.CADASTROS_FILE, 'r', encoding='utf-8') as f: cadastros = json.load(f)
+    with open(core.CADASTROS_FILE, 'w', encoding='utf-8') as f: json.dump({**cadastros, 'seq_snapshot': 0}, f)
+    assert len(abrir_csv().estoque_df) == 3
@@ -0,0 +1,43 @@
+import pytest
+
+import estoque_core as core
+from conftest import abrir, quantidade
+
+def base(estado):
+    return estado.estoque_df['ID'].to_numpy(), estado.versao, estado.versao_estrutura
+
+def test_delta_do_editor_vira_eventos_por_id():
+    eventos = core.eventos_do_editor([3, 1, 2], {0: {"Estoque Mínimo": 7}, "2": {"Excluir": True}, 1: {"Coluna Fantasma": 1}})
+    assert eventos == [{'op': 'edicao', 'id': 3, 'campos': {"Estoque Mínimo": 7}}, {'op': 'exclusao', 'id': 2}]
+
+def test_posicao_fora_da_base_vira_value_error():
+    estado = abrir(); ids, _, _ = base(estado)
+    core.adicionar_item(estado, "Novo", "", "", "Agulhas", "Art Prime", 1, 1, "Unidade", 1.0)
+    with pytest.raises(ValueError, match="Recarregue"): core.eventos_do_editor(ids, {len(ids): {"Estoque Mínimo": 2}})
+
+def test_edicao_grava_so_as_celulas_e_sobrevive_a_baixa_concorrente():
+    estado = abrir(); ids, versao, estrutura = base(estado)
+    core.registrar_uso(estado, 1, 5)
+    core.aplicar_edicoes(estado, core.eventos_do_editor(ids, {0: {"Estoque Mínimo": 10}}), versao, estrutura)
+    recarregado = abrir()
+    assert quantidade(recarregado, 1) == 20.0 and int(recarregado.estoque_df.loc[0, "Estoque Mínimo"]) == 10
+
+def test_mesma_celula_alterada_em_outra_sessao_recusa_tudo():
+    estado = abrir(); ids, versao, estrutura = base(estado)
+    core.registrar_uso(estado, 1, 5)
+    with pytest.raises(ValueError, match="outra sessão"):
+        core.aplicar_edicoes(estado, core.eventos_do_editor(ids, {0: {"Quantidade em Estoque": 30}, 1: {"Estoque Mínimo": 1}}), versao, estrutura)
+    assert quantidade(estado, 1) == 20.0 and int(estado.estoque_df.loc[1, "Estoque Mínimo"]) == 100
+
+def test_exclusao_em_outra_sessao_recusa_edicao():
+    estado = abrir(); ids, versao, estrutura = base(estado)
+    core.aplicar_edicoes(estado, core.eventos_do_editor(ids, {2: {"Excluir": True}}))
+    with pytest.raises(ValueError, match="excluídos"):
+        core.aplicar_edicoes(estado, core.eventos_do_editor(ids, {0: {"Estoque Mínimo": 3}}), versao, estrutura)
+
+@pytest.mark.parametrize("coluna", ["Quantidade em Estoque", "Estoque Mínimo", "Preço de Custo"])
+def test_valores_negativos_sao_recusados(coluna):
+    estado = abrir(); ids, versao, estrutura = base(estado)
+    with pytest.raises(ValueError, match="negativo"):
+        core.aplicar_edicoes(estado, core.eventos_do_editor(ids, {0: {coluna: -5}}), versao, estrutura)
+    assert quantidade(estado, 1) == 25.0
@@ -0,0 +1,22 @@
+import threading
+
+from instrumentacao import Instrumentacao
+
+def test_etapa_fora_de_um_rerun_nao_registra_nada():
+    medidor = Instrumentacao()
+    with medidor.etapa("pdf"): pass
+    medidor.finalizar_rerun("Painel Principal")
+    assert medidor.registros() == []
+
+def test_pdf_em_outra_thread_vira_registro_avulso_sem_tocar_no_rerun():
+    medidor = Instrumentacao(); medidor.iniciar_rerun()
+    # Como o download_button do Streamlit: o callable roda numa thread que não tem rerun em andamento.
+    def gerar():
+        with medidor.avulso("PDF: Lista de Compras", "pdf"): pass
+    with medidor.etapa("página"):
+        thread = threading.Thread(target=gerar); thread.start(); thread.join()
+    medidor.finalizar_rerun("Lista de Compras")
+    pdf, rerun = medidor.registros()
+    assert pdf['pagina'] == "PDF: Lista de Compras" and pdf['avulso'] and list(pdf['etapas']) == ['pdf']
+    assert rerun['pagina'] == "Lista de Compras" and list(rerun['etapas']) == ['página']
+    assert set(medidor.por_etapa()['Etapa']) == {'pdf', 'página'}
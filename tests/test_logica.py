@@ -0,0 +1,39 @@
+import pytest
+
+import estoque_core as core
+from conftest import abrir, quantidade
+
+def test_baixa_em_lote_soma_ids_repetidos_e_nao_altera_versao_anterior():
+    estado = abrir(); anterior = estado.estoque_df
+    core.registrar_uso_em_lote(estado, [{'id': 1, 'qtd': 2}, {'id': 3, 'qtd': 4}, {'id': 1, 'qtd': 1}])
+    assert quantidade(estado, 1) == 22.0 and quantidade(estado, 3) == 36.0
+    # Quem leu o DataFrame antes da baixa continua vendo a versão antiga.
+    assert quantidade(estado, 2) == 240.0 and anterior['Quantidade em Estoque'].tolist() == [25.0, 240.0, 40.0]
+
+def test_baixa_em_lote_com_id_ausente_nao_grava_nada():
+    estado = abrir(); versao = estado.versao
+    with pytest.raises(ValueError, match="99"): core.registrar_uso_em_lote(estado, [{'id': 1, 'qtd': 2}, {'id': 99, 'qtd': 1}])
+    assert quantidade(estado, 1) == 25.0 and estado.versao == versao
+    assert quantidade(abrir(), 1) == 25.0
+
+def _conferir_valores(estado):
+    df = estado.estoque_df; valores = (df['Quantidade em Estoque'] * df['Preço de Custo']).fillna(0.0)
+    assert estado.valor_por_id == pytest.approx(dict(zip(df['ID'].astype(int), valores)))
+    assert estado.valor_total == pytest.approx(float(valores.sum()))
+
+def test_valor_do_estoque_incremental_bate_com_recalculo_completo():
+    estado = abrir(); _conferir_valores(estado)
+    core.adicionar_item(estado, "Filme PVC", "Plastifilm", "Rolo", "Descartáveis", "Fornecedor Local", 12, 2, "Rolo", 9.9); _conferir_valores(estado)
+    core.registrar_uso_em_lote(estado, [{'id': 1, 'qtd': 3}, {'id': 4, 'qtd': 2}]); _conferir_valores(estado)
+    core.aplicar_edicoes(estado, [{'op': 'edicao', 'id': 2, 'campos': {'Preço de Custo': 0.5, 'Quantidade em Estoque': 100.0}}]); _conferir_valores(estado)
+    core.aplicar_edicoes(estado, [{'op': 'exclusao', 'id': 3}]); _conferir_valores(estado)
+    assert 3 not in estado.valor_por_id
+
+def test_ressincronia_do_valor_total_nao_depende_da_versao(monkeypatch):
+    monkeypatch.setattr(core, 'RESSINCRONIZAR_VALOR_A_CADA', 3)
+    estado = abrir(); estado.valor_total += 0.5  # erro acumulado simulado
+    for n in range(3):
+        # Alterações de colunas e cadastros sobem `versao` sem passar pela atualização dos valores.
+        core.definir_colunas_visiveis(estado, core.COLUNAS_PADRAO); core.alterar_cadastro(estado, 'categorias', f"Extra {n}")
+        core.registrar_uso(estado, 1, 1)
+    _conferir_valores(estado)
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+import estoque_core as core
+from conftest import abrir, quantidade
+
+def preparar_legado():
+    estado = abrir(core.ArmazenamentoCSV()); core.registrar_uso(estado, 1, 5)
+    core.alterar_cadastro(estado, 'categorias', 'Biqueiras')
+    return estado
+
+def test_migracao_leva_estoque_cadastros_e_historico():
+    legado = preparar_legado(); estado = abrir()
+    assert os.path.exists(core.ESTOQUE_DB) and not os.path.exists(f"{core.ESTOQUE_DB}.migrando")
+    assert quantidade(estado, 1) == 20.0 and 'Biqueiras' in estado.categorias
+    assert [e['seq'] for e in estado.armazenamento.ler_movimentos()] == [e['seq'] for e in legado.armazenamento.ler_movimentos()]
+    core.registrar_uso(estado, 1, 1); assert quantidade(abrir(), 1) == 19.0
+
+def test_falha_no_meio_da_migracao_nao_deixa_banco_parcial(monkeypatch):
+    preparar_legado()
+    def falhar(self, conexao, registros): raise OSError("disco cheio")
+    with monkeypatch.context() as m:
+        m.setattr(core.ArmazenamentoSQLite, '_upsert', falhar)
+        with pytest.raises(OSError): abrir()
+    assert not os.path.exists(core.ESTOQUE_DB) and not os.path.exists(f"{core.ESTOQUE_DB}.migrando")
+    estado = abrir()
+    assert len(estado.estoque_df) == 3 and quantidade(estado, 1) == 20.0 and 'Biqueiras' in estado.categorias
@@ -0,0 +1,25 @@
+import re
+import zlib
+
+import pandas as pd
+
+import estoque_core as core
+
+def _paginas(pdf):
+    # Um fluxo de conteúdo (comprimido) por página.
+    return [zlib.decompress(s) for s in re.findall(rb"stream\n(.*?)\nendstream", pdf, re.S)]
+
+def test_pdf_longo_quebra_paginas_e_repete_o_cabecalho():
+    df = pd.DataFrame({'Nome do Item': [f"Item {n}" for n in range(100)], 'Quantidade': range(100), 'Observações': [None, "ok"] * 50})
+    pdf = core.gerar_pdf_relatorio(df, "Relatório de Teste")
+    paginas = _paginas(pdf)
+    # A4 deitado: 17 linhas na primeira página (título e data em cima) e 21 nas seguintes.
+    assert len(re.findall(rb"/Type /Page\b", pdf)) == len(paginas) == 5
+    assert [p.count(b"(Nome do Item) Tj") for p in paginas] == [1] * 5
+    conteudo = b"".join(paginas)
+    assert all(f"(Item {n}) Tj".encode() in conteudo for n in range(100))
+    assert b"(nan)" not in conteudo and b"(None)" not in conteudo
+
+def test_pdf_curto_fica_numa_pagina():
+    pdf = core.gerar_pdf_relatorio(pd.DataFrame({'Nome do Item': ["Cartucho"], 'Quantidade': [25.0]}), "Lista de Compras")
+    assert len(_paginas(pdf)) == 1
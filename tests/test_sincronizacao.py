@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from sincronizacao_planilhas import PlanilhaFalsa, SincronizadorPlanilhas
+
+COLUNAS = ['ID', 'Nome', 'Qtd']
+
+def esperar(condicao, limite=5.0):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if condicao(): return True
+        time.sleep(0.02)
+    return False
+
+@pytest.fixture
+def criar():
+    criados = []
+    def criar(planilha, linhas=(), **opcoes):
+        opcoes = {'janela': 0.2, 'espera_inicial': 0.01, **opcoes}
+        sincronizador = SincronizadorPlanilhas(lambda: planilha, COLUNAS, lambda: [list(l) for l in linhas], **opcoes)
+        criados.append(sincronizador); return sincronizador
+    yield criar
+    for sincronizador in criados: sincronizador.encerrar()
+
+def semear(planilha, *linhas):
+    planilha.batch_update([{'range': 'A1', 'values': [COLUNAS, *map(list, linhas)]}])
+    planilha.chamadas = 0
+
+def test_alteracoes_na_janela_viram_um_batch_update_com_a_ultima_versao(criar):
+    planilha = PlanilhaFalsa(); semear(planilha, [1, 'a', 1], [2, 'b', 2])
+    sincronizador = criar(planilha)
+    for qtd in range(10): sincronizador.enfileirar([[1, 'a', qtd], [3, 'c', qtd]])
+    assert esperar(lambda: sincronizador.status()['linhas_enviadas'] == 2)
+    assert planilha.linhas() == [COLUNAS, [1, 'a', 9], [2, 'b', 2], [3, 'c', 9]]
+    assert planilha.chamadas == 2  # col_values (mapa de linhas) + um único batch_update
+
+def test_erros_da_api_sao_repetidos_com_backoff(criar):
+    planilha = PlanilhaFalsa(); semear(planilha, [1, 'a', 1]); planilha.falhas = 2
+    sincronizador = criar(planilha)
+    sincronizador.enfileirar([[1, 'a', 5]])
+    assert esperar(lambda: planilha.linhas() == [COLUNAS, [1, 'a', 5]])
+    assert esperar(lambda: sincronizador.status()['ultimo_erro'] is None and sincronizador.status()['ultimo_envio'] is not None)
+
+def test_exclusao_limpa_a_linha_e_ela_e_reaproveitada(criar):
+    planilha = PlanilhaFalsa(); semear(planilha, [1, 'a', 1], [2, 'b', 2], [3, 'c', 3])
+    sincronizador = criar(planilha)
+    sincronizador.enfileirar([], [2])
+    assert esperar(lambda: planilha.linhas() == [COLUNAS, [1, 'a', 1], ['', '', ''], [3, 'c', 3]])
+    sincronizador.enfileirar([[4, 'd', 4], [5, 'e', 5]])
+    assert esperar(lambda: planilha.linhas() == [COLUNAS, [1, 'a', 1], [4, 'd', 4], [3, 'c', 3], [5, 'e', 5]])
+
+def test_exclusao_e_inclusao_no_mesmo_lote_nao_se_sobrepoem(criar):
+    planilha = PlanilhaFalsa(); semear(planilha, [1, 'a', 1], [2, 'b', 2])
+    sincronizador = criar(planilha)
+    sincronizador.enfileirar([], [2]); sincronizador.enfileirar([[3, 'c', 3]])
+    assert esperar(lambda: planilha.linhas() == [COLUNAS, [1, 'a', 1], ['', '', ''], [3, 'c', 3]])
+
+def test_fila_cheia_cai_na_ressincronizacao_completa(criar):
+    planilha = PlanilhaFalsa(); semear(planilha, [9, 'velho', 0])
+    atuais = [[n, f'item {n}', float(n)] for n in range(1, 21)]
+    sincronizador = criar(planilha, atuais, tamanho_fila=2, janela=0.5)
+    for linha in atuais: sincronizador.enfileirar([linha])
+    assert sincronizador.precisa_ressincronizar.is_set() or sincronizador.fila.full()
+    assert esperar(lambda: planilha.linhas() == [COLUNAS, *atuais])
+
+def test_ressincronizacao_que_falha_e_tentada_de_novo(criar):
+    planilha = PlanilhaFalsa(falhas=3)
+    sincronizador = criar(planilha, [[1, 'a', 1]], tentativas=2)
+    sincronizador.ressincronizar()
+    assert esperar(lambda: planilha.linhas() == [COLUNAS, [1, 'a', 1]])